@@ -1,21 +1,107 @@
 # app.py
-from fastapi import FastAPI, HTTPException, Form
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from anyio.from_thread import run_sync as run_on_loop
+from fastapi import FastAPI, HTTPException, Form, Response, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
-from models import AskRequest, AskResponse
-from friendli_client import classify_query, generate_from_context, polite_block
-from guards import scan_text, public_context
-from store import log_event
+from models import AskRequest, AskResponse, BatchUploadRequest
+from friendli_client import (
+    classify_local, classify_remote_async, generate_from_context_async, stream_from_context_async,
+    aclose as close_llm_client, classify_cache, classify_tiers, llm_stats, MODEL,
+)
+from block_messages import block_message, block_message_async, pre_guard_key, post_guard_key, UNAVAILABLE_KEY
+from guards import scan_text, public_context, guard_registry, current_guard, StreamGuard
+from store import log_event, audit_logger
 from document_processor import doc_processor
+from clause_extraction import extract_document
+from cache import LRUCache, normalize_query
+from singleflight import SingleFlight
+from resilience import LLMUnavailableError
+from timing import stage, start_request, server_timing
+from metrics import registry, Gauge, CONTENT_TYPE, observe_stages, requests_total, policy_matches_total
 
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Hot-reload policy edits without a restart
+    guard_registry.start_policy_watcher()
+    yield
+    guard_registry.stop()
+    await close_llm_client()
+    if ingest_pool is not None:
+        ingest_pool.shutdown(cancel_futures=True)
+    # Drain buffered audit events before the process exits
+    audit_logger.close()
+
+# Coalesces identical in-flight /ask pipelines
+inflight = SingleFlight()
+
+# Post-guarded answers keyed on (public corpus version, policy version, model, query)
+answer_cache = LRUCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("ANSWER_CACHE_TTL", "0")) or None,
+    max_bytes=int(os.getenv("ANSWER_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+)
+
+# Read size for /upload-document/stream
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", str(1024 * 1024)))
+
+# Process pool for /upload-documents/batch, created on first use.
+# INGEST_WORKERS=0 extracts on a thread instead. Workers are spawned (not
+# forked from a process with live threads and SQLite handles) and only
+# import clause_extraction.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+INGEST_START_METHOD = os.getenv("INGEST_START_METHOD", "spawn")
+ingest_pool: Optional[ProcessPoolExecutor] = None
+_ingest_pool_lock = threading.Lock()
+
+def _ingest_pool() -> Optional[ProcessPoolExecutor]:
+    # Called from threadpool threads: concurrent first batches must share one pool
+    global ingest_pool
+    if INGEST_WORKERS <= 0:
+        return None
+    with _ingest_pool_lock:
+        if ingest_pool is None:
+            ingest_pool = ProcessPoolExecutor(
+                max_workers=INGEST_WORKERS, mp_context=multiprocessing.get_context(INGEST_START_METHOD)
+            )
+    return ingest_pool
+
+# Opt-in: start generation while the remote pre-guard is still running
+SPECULATIVE_GENERATION = os.getenv("SPECULATIVE_GENERATION", "0") == "1"
+speculation_stats = {"started": 0, "used": 0, "wasted": 0}
+
+# Computed at scrape time from the per-sensitivity indexes (O(1) per partition)
+registry.register(Gauge(
+    "confidra_corpus_clauses", "Clauses in the corpus by sensitivity.", ("sensitivity",),
+    callback=lambda: {(sensitivity,): len(index) for sensitivity, index in doc_processor.indexes.items()},
+))
+
+def _discard(task: asyncio.Task):
+    """Cancel a speculative generation whose result must not be used"""
+    speculation_stats["wasted"] += 1
+    task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
 app = FastAPI(
     title="Contract Compliance Sentinel",
     version="0.1.0",
     description="Pre- and post-guard rails to prevent NDA/regulated clause leakage.",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -31,78 +117,182 @@ app.add_middleware(
 def health():
     return {"ok": True}
 
-@app.post("/ask", response_model=AskResponse)
-def ask(req: AskRequest):
+@app.get("/stats")
+def stats():
+    """Cache and audit-log counters for this worker"""
+    return {
+        "classify_cache": classify_cache.stats(),
+        "classify_tiers": dict(classify_tiers),
+        "audit_log": dict(audit_logger.stats),
+        "coalescing": dict(inflight.stats),
+        "speculation": dict(speculation_stats),
+        "answer_cache": answer_cache.stats(),
+        "llm": llm_stats(),
+    }
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text exposition of stage latencies, outcomes and corpus size"""
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+async def run_pipeline(query: str):
     """
     Flow:
       1) Pre-guard classification → block if sensitive/exfiltration
       2) Generate strictly from PUBLIC context (no private corp data)
       3) Post-guard scan (protected overlap + rules) → block/redact/pass
-      4) Log all outcomes
+
+    With SPECULATIVE_GENERATION=1, step 2 starts alongside a remote step 1;
+    its result is discarded if the pre-guard blocks, and the answer is never
+    released before both the pre-guard and the post-guard have passed.
+
+    Returns (response, event_type, event_data, raw_answer); the caller adds
+    its user_id and logs the event, so coalesced requests each get their own
+    audit entry.
     """
-    try:
-        # ---------- 1) Pre-guard classify ----------
-        decision = classify_query(req.query)
-        label = decision.get("label", "safe")
+    # ---------- 1) Pre-guard classify ----------
+    generation = None
+    with stage("classify"):
+        decision = classify_local(query)
+    if decision is None:
+        if SPECULATIVE_GENERATION:
+            generation = asyncio.ensure_future(_generate(query))
+            speculation_stats["started"] += 1
+        try:
+            with stage("classify"):
+                decision = await classify_remote_async(query)
+        except BaseException:
+            if generation is not None:
+                _discard(generation)
+            raise
+    label = decision.get("label", "safe")
 
-        if label in ("sensitive", "exfiltration"):
-            msg = polite_block(f"Query classified as {label}")
-            log_event("blocked_pre", {
-                "user": req.user_id,
-                "query": req.query,
-                "decision": decision
-            })
-            return AskResponse(
-                action="blocked",
-                reason=f"Pre-guard: {label}",
-                safe_output=msg,
-                evidence={"decision": decision},
-            )
+    if label in ("sensitive", "exfiltration"):
+        if generation is not None:
+            _discard(generation)
+        with stage("polite_block"):
+            msg = await block_message_async(pre_guard_key(label))
+        return AskResponse(
+            action="blocked",
+            reason=f"Pre-guard: {label}",
+            safe_output=msg,
+            evidence={"decision": decision},
+        ), "blocked_pre", {"query": query, "decision": decision}, None
+
+    # ---------- 2) RAG from PUBLIC context only ----------
+    if generation is not None:
+        answer = await generation
+        speculation_stats["used"] += 1
+    else:
+        answer = await _generate(query)
+
+    response, event_type, data = await post_guard(query, answer)
+    # Recorded so train_from_log can skip queries the local tiers decided
+    data["decision"] = decision
+    return response, event_type, data, answer
 
-        # ---------- 2) RAG from PUBLIC context only ----------
-        ctx = public_context()
-        answer = generate_from_context(ctx, req.query)
+async def _generate(query: str) -> str:
+    with stage("context"):
+        ctx = public_context(query)
+    with stage("generate"):
+        return await generate_from_context_async(ctx, query)
 
-        # ---------- 3) Post-guard scan ----------
+async def post_guard(query: str, answer: str):
+    """Step 3: post-guard scan (protected overlap + rules) → block/redact/pass"""
+    with stage("scan"):
         scan = scan_text(answer)
 
-        if scan["action"] == "blocked":
-            msg = polite_block(scan["reason"])
-            log_event("blocked_post", {
-                "user": req.user_id,
-                "query": req.query,
-                "reason": scan["reason"],
-                "raw_answer": answer,
-            })
-            return AskResponse(
-                action="blocked",
-                reason=scan["reason"],
-                safe_output=msg,
-                evidence={"raw": answer},
-            )
+    if scan["action"] == "blocked":
+        with stage("polite_block"):
+            msg = await block_message_async(post_guard_key(scan["policy"]))
+        return AskResponse(
+            action="blocked",
+            reason=scan["reason"],
+            safe_output=msg,
+            evidence={"raw": answer},
+        ), "blocked_post", {"query": query, "reason": scan["reason"], "policy": scan["policy"], "raw_answer": answer}
 
-        if scan["action"] == "redacted":
-            log_event("redacted", {
-                "user": req.user_id,
-                "query": req.query,
-                "reason": scan["reason"],
-            })
-            return AskResponse(
-                action="redacted",
-                reason=scan["reason"],
-                safe_output=scan["safe_output"],
-                evidence={},
-            )
+    if scan["action"] == "redacted":
+        return AskResponse(
+            action="redacted",
+            reason=scan["reason"],
+            safe_output=scan["safe_output"],
+            evidence={},
+        ), "redacted", {"query": query, "reason": scan["reason"], "policy": scan["policy"]}
+
+    return AskResponse(
+        action="pass",
+        reason="OK",
+        safe_output=answer,
+        evidence={},
+    ), "pass", {"query": query}
+
+def _entry_size(response: AskResponse, data: dict, answer) -> int:
+    # Approximate: the strings dominate the footprint of an entry
+    return (len(response.safe_output) + len(response.reason) + len(answer or "")
+            + len(json.dumps(response.evidence, default=str)) + len(json.dumps(data, default=str)))
+
+async def answer_query(query: str):
+    """
+    run_pipeline behind the answer cache. Entries are keyed on the public
+    corpus version, policy version, model and normalized query; if only the
+    protected corpus changed since an entry was stored, its raw answer is
+    re-scanned against the current guard instead of being served as-is.
+    """
+    guard = current_guard()
+    key = (doc_processor.public_version, guard.policy_version, MODEL, normalize_query(query))
+    cached = answer_cache.get(key)
+    if cached is not None:
+        guard_version, response, event_type, data, answer = cached
+        if guard_version == guard.version or answer is None:
+            return response, event_type, data, answer
+        decision = data.get("decision")
+        response, event_type, data = await post_guard(query, answer)
+        data["decision"] = decision
+    else:
+        response, event_type, data, answer = await run_pipeline(query)
+    answer_cache.set(key, (guard.version, response, event_type, data, answer),
+                     size=_entry_size(response, data, answer))
+    return response, event_type, data, answer
+
+@app.post("/ask", response_model=AskResponse)
+async def ask(req: AskRequest, http_response: Response):
+    """
+    Runs the guarded pipeline (see run_pipeline) and logs all outcomes.
 
-        # ---------- 4) Pass ----------
-        log_event("pass", {"user": req.user_id, "query": req.query})
+    Repeated queries are served from the answer cache, and identical
+    concurrent queries against the same corpus and policy version share one
+    pipeline execution. Per-stage durations are returned in a Server-Timing
+    header and recorded in the /metrics histograms.
+    """
+    timings = start_request()
+    action = "error"
+    try:
+        key = (normalize_query(req.query), doc_processor.version, current_guard().policy_version)
+        response, event_type, data, _ = await inflight.do(key, lambda: answer_query(req.query))
+
+        with stage("log"):
+            log_event(event_type, {"user": req.user_id, **data, "query": req.query})
+        action = response.action
+        if "policy" in data:
+            policy_matches_total.inc(policy=data["policy"], action=action)
+        http_response.headers["Server-Timing"] = server_timing(timings)
+        return response
+
+    except LLMUnavailableError as e:
+        # Fail closed: nothing is released without both guard stages
+        action = "blocked"
+        log_event("blocked_unavailable", {
+            "user": req.user_id,
+            "query": req.query,
+            "error": repr(e),
+        })
         return AskResponse(
-            action="pass",
-            reason="OK",
-            safe_output=answer,
+            action="blocked",
+            reason="LLM unavailable",
+            safe_output=block_message(UNAVAILABLE_KEY),
             evidence={},
         )
-
     except HTTPException:
         # Let FastAPI handle explicit HTTPExceptions
         raise
@@ -114,34 +304,141 @@ def ask(req: AskRequest):
             "error": repr(e),
         })
         raise HTTPException(status_code=500, detail="Internal error")
+    finally:
+        requests_total.inc(endpoint="ask", action=action)
+        observe_stages("ask", timings)
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/ask/stream")
+async def ask_stream(req: AskRequest):
+    """
+    Server-sent events version of /ask.
+
+    Emits "token" events with guarded answer text as it is generated, then a
+    final "done" event with the action and reason. The post-guard runs
+    incrementally (see StreamGuard), so protected text is never emitted; a
+    block mid-stream ends the stream with a "blocked" event instead.
+    """
+    async def events():
+        try:
+            # ---------- 1) Pre-guard classify ----------
+            decision = classify_local(req.query) or await classify_remote_async(req.query)
+            label = decision.get("label", "safe")
+            if label in ("sensitive", "exfiltration"):
+                msg = await block_message_async(pre_guard_key(label))
+                log_event("blocked_pre", {"user": req.user_id, "query": req.query, "decision": decision})
+                yield _sse("blocked", {"safe_output": msg})
+                yield _sse("done", {"action": "blocked", "reason": f"Pre-guard: {label}"})
+                requests_total.inc(endpoint="ask_stream", action="blocked")
+                return
+
+            # ---------- 2+3) Generate and scan incrementally ----------
+            guard = StreamGuard(current_guard())
+            answer = []
+            stream = stream_from_context_async(public_context(req.query), req.query)
+            try:
+                async for delta in stream:
+                    answer.append(delta)
+                    text = guard.feed(delta)
+                    if guard.blocked:
+                        break
+                    if text:
+                        yield _sse("token", {"text": text})
+            finally:
+                await stream.aclose()
+            if not guard.blocked:
+                text = guard.finish()
+                if text:
+                    yield _sse("token", {"text": text})
+
+            result = guard.result()
+            if result["action"] == "blocked":
+                msg = await block_message_async(post_guard_key(result["policy"]))
+                log_event("blocked_post", {
+                    "user": req.user_id,
+                    "query": req.query,
+                    "reason": result["reason"],
+                    "policy": result["policy"],
+                    "raw_answer": "".join(answer),
+                    "decision": decision,
+                })
+                yield _sse("blocked", {"safe_output": msg})
+            elif result["action"] == "redacted":
+                log_event("redacted", {
+                    "user": req.user_id,
+                    "query": req.query,
+                    "reason": result["reason"],
+                    "policy": result["policy"],
+                    "decision": decision,
+                })
+            else:
+                log_event("pass", {"user": req.user_id, "query": req.query, "decision": decision})
+            if result.get("policy"):
+                policy_matches_total.inc(policy=result["policy"], action=result["action"])
+            requests_total.inc(endpoint="ask_stream", action=result["action"])
+            yield _sse("done", {"action": result["action"], "reason": result["reason"]})
+
+        except LLMUnavailableError as e:
+            log_event("blocked_unavailable", {
+                "user": req.user_id,
+                "query": req.query,
+                "error": repr(e),
+            })
+            requests_total.inc(endpoint="ask_stream", action="blocked")
+            yield _sse("blocked", {"safe_output": block_message(UNAVAILABLE_KEY)})
+            yield _sse("done", {"action": "blocked", "reason": "LLM unavailable"})
+        except Exception as e:
+            log_event("error", {
+                "user": req.user_id,
+                "query": req.query,
+                "error": repr(e),
+            })
+            requests_total.inc(endpoint="ask_stream", action="error")
+            yield _sse("error", {"detail": "Internal error"})
+
+    return StreamingResponse(events(), media_type="text/event-stream")
 
 @app.post("/upload-document")
 async def upload_document(
+    http_response: Response,
     filename: str = Form(...),
     content: str = Form(...),
     sensitivity: str = Form(default="public"),
     timestamp: str = Form(...)
 ):
     """
-    Upload and process a document for contract compliance
+    Upload and process a document for contract compliance. Extraction and
+    storage run on a worker thread; the in-memory update runs on the loop.
     """
+    timings = start_request()
+    action = "error"
     try:
         # Process the document using the document processor
-        result = doc_processor.process_document(content, filename, sensitivity)
+        with stage("ingest"):
+            result = await run_in_threadpool(doc_processor.process_document, content, filename, sensitivity,
+                                             apply=run_on_loop)
         
         if result["success"]:
-            log_event("document_upload", {
-                "filename": filename,
-                "sensitivity": sensitivity,
-                "content_length": len(content),
-                "clauses_added": result["clauses_added"],
-                "timestamp": timestamp
-            })
+            with stage("log"):
+                log_event("document_upload", {
+                    "filename": filename,
+                    "sensitivity": sensitivity,
+                    "content_length": len(content),
+                    "clauses_added": result["clauses_added"],
+                    "duplicate_clauses": result["duplicates"],
+                    "timestamp": timestamp
+                })
             
+            action = "pass"
+            http_response.headers["Server-Timing"] = server_timing(timings)
             return {
                 "success": True,
                 "message": result["message"],
-                "clauses_extracted": result["clauses_added"],
+                "clauses_extracted": result["clauses_added"] + result["duplicates"],
+                "clauses_added": result["clauses_added"],
+                "duplicate_clauses": result["duplicates"],
                 "sensitivity": sensitivity
             }
         else:
@@ -154,6 +451,151 @@ async def upload_document(
             "error": repr(e)
         })
         raise HTTPException(status_code=500, detail=f"Document upload failed: {str(e)}")
+    finally:
+        requests_total.inc(endpoint="upload_document", action=action)
+        observe_stages("upload_document", timings)
+
+@app.post("/upload-document/stream")
+async def upload_document_stream(
+    http_response: Response,
+    file: UploadFile = File(...),
+    sensitivity: str = Form(default="public"),
+    timestamp: str = Form(default=None)
+):
+    """
+    Multipart upload for very large documents. The file is read in
+    STREAM_CHUNK_SIZE chunks and split, analysed and persisted incrementally
+    (see DocumentProcessor.process_stream) on a worker thread, so neither
+    memory nor the event loop is tied up by the size of the document. Only
+    the in-memory corpus and index updates are handed back to the event
+    loop, so concurrent /ask searches never see them half-applied.
+    """
+    timings = start_request()
+    action = "error"
+    filename = file.filename or "upload.txt"
+    try:
+        chunks = iter(lambda: file.file.read(STREAM_CHUNK_SIZE), b"")
+        with stage("ingest"):
+            result = await run_in_threadpool(doc_processor.process_stream, chunks, filename, sensitivity,
+                                             apply=run_on_loop)
+        
+        if not result["success"]:
+            raise Exception(result["error"])
+        
+        with stage("log"):
+            log_event("document_upload", {
+                "filename": filename,
+                "sensitivity": sensitivity,
+                "content_length": result["bytes"],
+                "clauses_added": result["clauses_added"],
+                "duplicate_clauses": result["duplicates"],
+                "timestamp": timestamp,
+                "streamed": True
+            })
+        
+        action = "pass"
+        http_response.headers["Server-Timing"] = server_timing(timings)
+        return {
+            "success": True,
+            "message": result["message"],
+            "clauses_extracted": result["clauses_added"] + result["duplicates"],
+            "clauses_added": result["clauses_added"],
+            "duplicate_clauses": result["duplicates"],
+            "sensitivity": sensitivity
+        }
+        
+    except Exception as e:
+        log_event("error", {
+            "action": "document_upload",
+            "filename": filename,
+            "error": repr(e)
+        })
+        raise HTTPException(status_code=500, detail=f"Document upload failed: {str(e)}")
+    finally:
+        await file.close()
+        requests_total.inc(endpoint="upload_document_stream", action=action)
+        observe_stages("upload_document_stream", timings)
+
+def _extract_all(documents):
+    names = [doc.filename for doc in documents]
+    texts = [doc.content for doc in documents]
+    levels = [doc.sensitivity for doc in documents]
+    pool = _ingest_pool()
+    if pool is None:
+        return list(map(extract_document, texts, names, levels))
+    # Several documents per task keeps pickling overhead low for big batches
+    chunksize = max(1, len(documents) // (INGEST_WORKERS * 4))
+    return list(pool.map(extract_document, texts, names, levels, chunksize=chunksize))
+
+@app.post("/upload-documents/batch")
+async def upload_documents_batch(req: BatchUploadRequest, http_response: Response):
+    """
+    Bulk onboarding: extract clauses from every document in parallel on the
+    ingest process pool, then store them in a single transaction with one
+    index update and one guard rebuild for the whole batch. Per-document
+    results are returned alongside aggregate throughput.
+    """
+    timings = start_request()
+    action = "error"
+    started = time.perf_counter()
+    try:
+        with stage("extract"):
+            extracted = await run_in_threadpool(_extract_all, req.documents)
+        with stage("ingest"):
+            results = await run_in_threadpool(doc_processor.process_batch, extracted, apply=run_on_loop)
+        elapsed = time.perf_counter() - started
+        
+        with stage("log"):
+            for doc, result in zip(req.documents, results):
+                if result["success"]:
+                    log_event("document_upload", {
+                        "filename": doc.filename,
+                        "sensitivity": doc.sensitivity,
+                        "content_length": result["bytes"],
+                        "clauses_added": result["clauses_added"],
+                        "duplicate_clauses": result["duplicates"],
+                        "timestamp": req.timestamp,
+                        "batch": True
+                    })
+                else:
+                    log_event("error", {
+                        "action": "document_upload",
+                        "filename": doc.filename,
+                        "error": result["error"]
+                    })
+        
+        action = "pass"
+        http_response.headers["Server-Timing"] = server_timing(timings)
+        clauses = sum(result["clauses_extracted"] for result in results)
+        total_bytes = sum(result["bytes"] for result in results)
+        return {
+            "success": all(result["success"] for result in results),
+            "documents": results,
+            "summary": {
+                "documents": len(results),
+                "failed": sum(1 for result in results if not result["success"]),
+                "clauses_extracted": clauses,
+                "clauses_added": sum(result["clauses_added"] for result in results),
+                "duplicate_clauses": sum(result["duplicates"] for result in results),
+                "bytes": total_bytes,
+                "elapsed_seconds": elapsed,
+                "documents_per_second": len(results) / elapsed if elapsed else None,
+                "clauses_per_second": clauses / elapsed if elapsed else None,
+                "bytes_per_second": total_bytes / elapsed if elapsed else None,
+                "workers": INGEST_WORKERS,
+            },
+        }
+    
+    except Exception as e:
+        log_event("error", {
+            "action": "document_upload_batch",
+            "documents": len(req.documents),
+            "error": repr(e)
+        })
+        raise HTTPException(status_code=500, detail=f"Batch upload failed: {str(e)}")
+    finally:
+        requests_total.inc(endpoint="upload_documents_batch", action=action)
+        observe_stages("upload_documents_batch", timings)
 
 @app.get("/documents")
 async def list_documents():
@@ -0,0 +1,65 @@
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile (p in 0..100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(round(p / 100.0 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else None,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+    }
+
+def prepare_workdir(prefix: str = "confidra-bench-") -> str:
+    """
+    Copy the rules and seed data into a temp dir to run the backend from, so
+    benchmarks never touch the real clause store or audit log.
+    """
+    workdir = tempfile.mkdtemp(prefix=prefix)
+    shutil.copytree(os.path.join(BACKEND_DIR, "rules"), os.path.join(workdir, "rules"))
+    os.makedirs(os.path.join(workdir, "data"))
+    shutil.copy(os.path.join(BACKEND_DIR, "data", "contract.json"), os.path.join(workdir, "data", "contract.json"))
+    return workdir
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+def write_results(path: str, kind: str, config: Dict[str, Any], results: Dict[str, Any]) -> str:
+    """Write a machine-readable result file and return its path"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    payload = {
+        "benchmark": kind,
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    return path
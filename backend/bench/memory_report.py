@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Per-clause memory of the in-memory corpus: plain dicts vs ClauseRecord.
+
+Writes --clauses synthetic clauses (shaped like DocumentProcessor's
+extraction output) to a throwaway ClauseStore, then loads the corpus both
+ways under tracemalloc and reports the retained bytes per clause, with and
+without the full_text strings both layouts must keep.
+
+    python bench/memory_report.py --clauses 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _common import BACKEND_DIR, prepare_workdir, write_results
+from microbench import make_vocabulary, synthetic_text
+
+CLAUSE_TYPES = ["compensation", "benefits", "confidentiality", "termination",
+                "job_description", "work_conditions", "general"]
+
+def synthetic_rows(rng: random.Random, count: int, words: int, clauses_per_document: int):
+    vocabulary = make_vocabulary(rng)
+    started = datetime(2025, 1, 1)
+    for i in range(count):
+        text = synthetic_text(rng, vocabulary, words)
+        yield {
+            "clause": text[:200] + "..." if len(text) > 200 else text,
+            "full_text": text,
+            "sensitivity": "protected" if rng.random() < 0.3 else "public",
+            "type": rng.choice(CLAUSE_TYPES),
+            "document": f"contract_{i // clauses_per_document}.pdf",
+            "timestamp": (started + timedelta(seconds=i, microseconds=rng.randint(1, 999999))).isoformat(),
+        }
+
+def retained(load):
+    """Bytes still allocated after load() (its result is kept alive)"""
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+    corpus = load()
+    elapsed = time.perf_counter() - started
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    text_bytes = sum(sys.getsizeof(clause["full_text"]) for clause in corpus)
+    return {"bytes": after - before, "full_text_bytes": text_bytes, "load_seconds": elapsed}, len(corpus)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clauses", type=int, default=1000000)
+    parser.add_argument("--clause-words", type=int, default=45, help="~300 characters, so previews are truncated")
+    parser.add_argument("--clauses-per-document", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=os.path.join("bench_results", f"memory_{time.strftime('%Y%m%d_%H%M%S')}.json"))
+    args = parser.parse_args()
+    out = os.path.abspath(args.out)
+
+    os.chdir(prepare_workdir("confidra-memory-"))
+    sys.path.insert(0, BACKEND_DIR)
+    from clause_record import ClauseRecord
+    from clause_store import ClauseStore
+
+    store = ClauseStore(os.path.abspath(os.path.join("data", "memory.db")), legacy_json=os.path.join("data", "none.json"))
+    rng = random.Random(args.seed)
+    rows = synthetic_rows(rng, args.clauses, args.clause_words, args.clauses_per_document)
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == 50000:
+            store.append(batch)
+            batch = []
+    if batch:
+        store.append(batch)
+
+    results = {}
+    for name, load in (("dict", store.load_all), ("record", lambda: store.load_all(ClauseRecord.from_dict))):
+        result, count = retained(load)
+        result["per_clause"] = result["bytes"] / count
+        result["per_clause_excluding_text"] = (result["bytes"] - result["full_text_bytes"]) / count
+        results[name] = result
+    store.close()
+
+    print(f"{args.clauses} clauses")
+    print(f"{'':10}{'total MiB':>12}{'B/clause':>12}{'B/clause w/o text':>20}{'load s':>10}")
+    for name, r in results.items():
+        print(f"{name:10}{r['bytes'] / 2**20:12.1f}{r['per_clause']:12.0f}"
+              f"{r['per_clause_excluding_text']:20.0f}{r['load_seconds']:10.2f}")
+    saved = 1 - results["record"]["bytes"] / results["dict"]["bytes"]
+    print(f"record saves {saved:.0%} overall, "
+          f"{results['dict']['per_clause_excluding_text'] - results['record']['per_clause_excluding_text']:.0f} B/clause")
+    config = {k: v for k, v in vars(args).items() if k != "out"}
+    print(f"wrote {write_results(out, 'memory_report', config, results)}")
+
+if __name__ == "__main__":
+    main()
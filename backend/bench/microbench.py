@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Scaling microbenchmarks for the guard and DocumentProcessor hot paths.
+
+Builds synthetic clause corpora of growing size (10^2 .. --max-size clauses)
+and measures, at every size:
+
+    guard_build        compiling the post-guard automaton (CompiledGuard)
+    scan_text[out=L]   scanning an L-character model output
+    public_context     building the prompt context for a query
+    search_clauses     keyword search over public + protected clauses
+    extract_clauses    splitting/analysing a document of N sections
+    save_data          appending --save-batch clauses to a store of N rows
+
+Wall time comes from --repeat untraced runs; peak memory from one extra
+run under tracemalloc. Each series also gets a log-log slope (~1.0 means
+linear in corpus size, ~0 means flat), so regressions in asymptotic
+behaviour show up as a changed exponent rather than a noisy millisecond.
+
+    python bench/microbench.py --max-size 100000 --output-lengths 200,2000,20000
+
+Everything runs in a throwaway copy of the data and rules. Results are
+printed and written as JSON to --out; --plot also draws the curves if
+matplotlib is installed.
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _common import BACKEND_DIR, prepare_workdir, summarize, write_results
+
+DOMAIN_WORDS = [
+    "employee", "employer", "agreement", "termination", "notice", "salary", "bonus", "vacation",
+    "office", "hours", "payment", "invoice", "confidential", "proprietary", "schedule", "annex",
+    "party", "parties", "warranty", "liability", "indemnify", "governing", "law", "renewal",
+]
+
+def make_vocabulary(rng: random.Random, size: int = 5000):
+    """Domain words plus pseudo-words, so postings lists have a realistic long tail"""
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set(DOMAIN_WORDS)
+    while len(words) < size:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(4, 10))))
+    return sorted(words)
+
+def synthetic_text(rng: random.Random, vocabulary, words: int) -> str:
+    return " ".join(rng.choice(vocabulary) for _ in range(words)).capitalize() + "."
+
+def synthetic_clauses(rng: random.Random, vocabulary, count: int, start: int, words: int, protected_share: float):
+    clauses = []
+    for i in range(start, start + count):
+        text = f"{synthetic_text(rng, vocabulary, words)} (ref {i})"
+        clauses.append({
+            "clause": text,
+            "full_text": text,
+            "sensitivity": "protected" if rng.random() < protected_share else "public",
+            "type": "general",
+            "document": f"synthetic_{i // 50}.txt",
+            "timestamp": "2024-01-01T00:00:00",
+        })
+    return clauses
+
+def synthetic_document(rng: random.Random, vocabulary, sections: int, words: int) -> str:
+    body = "\n".join(f"{i}. {synthetic_text(rng, vocabulary, words)}" for i in range(1, sections + 1))
+    return "SYNTHETIC AGREEMENT\n" + body
+
+def sizes_up_to(max_size: int, min_size: int = 100):
+    sizes, n = [], min_size
+    while n <= max_size:
+        sizes.append(n)
+        n *= 10
+    return sizes
+
+def measure(fn, repeat: int, memory: bool):
+    """Time `repeat` calls of fn, then one traced call for peak memory (bytes)"""
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - started)
+    result = {"time": summarize(durations)}
+    if memory:
+        tracemalloc.start()
+        baseline, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["peak_bytes"] = max(peak - baseline, 0)
+    return result
+
+def loglog_slope(points):
+    """Least-squares slope of log(y) against log(x)"""
+    points = [(math.log(x), math.log(y)) for x, y in points if x > 0 and y and y > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    denominator = sum((x - mean_x) ** 2 for x, _ in points)
+    if denominator == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / denominator
+
+def grow_corpus(processor, clauses):
+    """Add clauses through the real ingest path, minus extraction and listeners"""
+    processor._ingest(clauses)
+
+def run(args):
+    import guards
+    from document_processor import DocumentProcessor
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(rng)
+    queries = [" ".join(rng.sample(DOMAIN_WORDS, 2)) + " " + rng.choice(vocabulary) for _ in range(20)]
+    output_lengths = [int(v) for v in args.output_lengths.split(",") if v]
+    rules = guards.load_rules()
+
+    data_dir = os.path.abspath("data")
+    processor = DocumentProcessor(data_file=os.path.join(data_dir, "none.json"),
+                                  db_file=os.path.join(data_dir, "microbench.db"))
+    save_store = DocumentProcessor(data_file=os.path.join(data_dir, "none.json"),
+                                   db_file=os.path.join(data_dir, "microbench_save.db"))
+    # public_context reads the module-level processor
+    guards.doc_processor = processor
+
+    series = {}
+
+    def record(name, size, result):
+        series.setdefault(name, []).append({"size": size, **result})
+        peak = result.get("peak_bytes")
+        print(f"{name:24}{size:>10}{result['time']['p50'] * 1000:12.3f}{result['time']['p95'] * 1000:12.3f}"
+              f"{peak / 1024 if peak is not None else float('nan'):14.1f}", flush=True)
+
+    print(f"{'':24}{'size':>10}{'p50 ms':>12}{'p95 ms':>12}{'peak KiB':>14}")
+    for size in sizes_up_to(args.max_size):
+        clauses = synthetic_clauses(rng, vocabulary, size - len(processor.contracts), len(processor.contracts),
+                                    args.clause_words, args.protected_share)
+        grow_corpus(processor, clauses)
+        save_store.save_data(synthetic_clauses(rng, vocabulary, size - save_store.store.count(),
+                                               save_store.store.count(), args.clause_words, args.protected_share))
+        memory = not args.no_memory
+
+        protected = processor.get_protected_clauses()
+        build = lambda: guards.CompiledGuard(size, processor.version, 1, protected, rules)
+        record("guard_build", size, measure(build, 1, memory))
+        guard = build()
+
+        for length in output_lengths:
+            output = synthetic_text(rng, vocabulary, length // 6 + 1)[:length]
+            record(f"scan_text[out={length}]", size, measure(lambda: guard.scan(output), args.repeat, memory))
+
+        query_cycle = iter(queries * (args.repeat + 1))
+        record("public_context", size,
+               measure(lambda: guards.public_context(next(query_cycle)), args.repeat, memory))
+        query_cycle = iter(queries * (args.repeat + 1))
+        record("search_clauses", size,
+               measure(lambda: processor.search_clauses(next(query_cycle), include_protected=True, limit=10),
+                       args.repeat, memory))
+
+        if size <= args.max_extract_sections:
+            document = synthetic_document(rng, vocabulary, size, args.clause_words)
+            record("extract_clauses", size, measure(
+                lambda: processor.extract_clauses_from_text(document, "bench.txt"), min(args.repeat, 3), memory))
+
+        batches = iter([synthetic_clauses(rng, vocabulary, args.save_batch, 0, args.clause_words, args.protected_share)
+                        for _ in range(args.repeat + 1)])
+        record("save_data", size, measure(lambda: save_store.save_data(next(batches)), args.repeat, memory))
+
+    slopes = {}
+    for name, points in series.items():
+        slopes[name] = {
+            "time": loglog_slope([(p["size"], p["time"]["p50"]) for p in points]),
+            "memory": loglog_slope([(p["size"], p.get("peak_bytes")) for p in points]),
+        }
+    processor.store.close()
+    save_store.store.close()
+    return {"series": series, "slopes": slopes}
+
+def print_slopes(slopes):
+    def fmt(value):
+        return f"{value:8.2f}" if value is not None else "       -"
+    print(f"\n{'log-log slope':24}{'time':>8}{'memory':>8}")
+    for name, slope in slopes.items():
+        print(f"{name:24}{fmt(slope['time'])}{fmt(slope['memory'])}")
+
+def plot(results, path):
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib is not installed; skipping --plot")
+        return
+    fig, (ax_time, ax_mem) = plt.subplots(1, 2, figsize=(12, 5))
+    for name, points in results["series"].items():
+        sizes = [p["size"] for p in points]
+        ax_time.plot(sizes, [p["time"]["p50"] for p in points], marker="o", label=name)
+        if all("peak_bytes" in p for p in points):
+            ax_mem.plot(sizes, [max(p["peak_bytes"], 1) for p in points], marker="o", label=name)
+    for ax, label in ((ax_time, "p50 seconds"), (ax_mem, "peak bytes")):
+        ax.set_xscale("log")
+        ax.set_yscale("log")
+        ax.set_xlabel("clauses")
+        ax.set_ylabel(label)
+    ax_time.legend(fontsize="small")
+    fig.tight_layout()
+    fig.savefig(path)
+    print(f"wrote {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-size", type=int, default=10000,
+                        help="Largest corpus (clauses); sizes grow by 10x from 100, up to 1000000")
+    parser.add_argument("--output-lengths", default="200,2000,20000", help="Model output lengths for scan_text")
+    parser.add_argument("--clause-words", type=int, default=14)
+    parser.add_argument("--protected-share", type=float, default=0.3)
+    parser.add_argument("--max-extract-sections", type=int, default=100000)
+    parser.add_argument("--save-batch", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc runs")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--plot", help="Also write log-log scaling curves to this image")
+    parser.add_argument("--out", default=os.path.join("bench_results", f"micro_{time.strftime('%Y%m%d_%H%M%S')}.json"))
+    args = parser.parse_args()
+    out = os.path.abspath(args.out)
+    plot_path = os.path.abspath(args.plot) if args.plot else None
+
+    os.chdir(prepare_workdir("confidra-micro-"))
+    sys.path.insert(0, BACKEND_DIR)
+    results = run(args)
+    print_slopes(results["slopes"])
+    if plot_path:
+        plot(results, plot_path)
+    config = {k: v for k, v in vars(args).items() if k not in ("out", "plot")}
+    print(f"wrote {write_results(out, 'microbench', config, results)}")
+
+if __name__ == "__main__":
+    main()
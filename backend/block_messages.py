@@ -0,0 +1,84 @@
+import asyncio
+import os
+from typing import Dict
+
+from friendli_client import polite_block_async
+
+# Deterministic, compliance-approved block messages. Keys are
+# "pre:<classifier label>" or "post:<policy name>".
+TEMPLATES: Dict[str, str] = {
+    "pre:sensitive": (
+        "I'm sorry, but I can't help with that request. It asks for contract terms "
+        "that are confidential, such as penalties, pricing or other NDA-protected details."
+    ),
+    "pre:exfiltration": (
+        "I'm sorry, but I can't provide full or verbatim contract text. Please ask a "
+        "specific question and I'll answer it from the information that can be shared."
+    ),
+    "post:protected_clause": (
+        "I'm sorry, but the answer to this question would disclose protected contract "
+        "terms, so it can't be shared."
+    ),
+    "service:unavailable": (
+        "I'm sorry, but I can't answer right now because the compliance check could not "
+        "be completed. Please try again in a moment."
+    ),
+}
+
+_TOPICS = {
+    "termination_penalty": "termination penalty terms",
+    "pricing_discounts": "pricing and discount terms",
+    "financial_terms": "confidential financial terms",
+    "personal_information": "personal information",
+}
+
+DEFAULT_TEMPLATE = (
+    "I'm sorry, but the answer to this question would disclose {topic}, which is "
+    "covered by our compliance policy and can't be shared."
+)
+
+MODE = os.getenv("BLOCK_MESSAGE_MODE", "template")  # "template" or "llm_cached"
+
+_rewrites: Dict[str, str] = {}
+_locks: Dict[str, asyncio.Lock] = {}
+
+def pre_guard_key(label: str) -> str:
+    return f"pre:{label}"
+
+def post_guard_key(policy: str) -> str:
+    return f"post:{policy}"
+
+UNAVAILABLE_KEY = "service:unavailable"
+
+def block_message(key: str) -> str:
+    """Template message for a block reason key; never calls out"""
+    template = TEMPLATES.get(key)
+    if template is not None:
+        return template
+    name = key.split(":", 1)[-1]
+    return DEFAULT_TEMPLATE.format(topic=_TOPICS.get(name, name.replace("_", " ") + " details"))
+
+async def block_message_async(key: str) -> str:
+    """
+    Block message for a reason key.
+
+    In "llm_cached" mode the template is rewritten by the LLM once per key
+    and reused afterwards; any failure falls back to the template.
+    """
+    if MODE != "llm_cached" or key == UNAVAILABLE_KEY:
+        return block_message(key)
+
+    cached = _rewrites.get(key)
+    if cached is not None:
+        return cached
+
+    lock = _locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        if key not in _rewrites:
+            try:
+                # Only the generic template is sent, never matched contract text
+                _rewrites[key] = await polite_block_async(block_message(key))
+            except Exception as e:
+                print(f"Block message rewrite failed for {key}: {e}")
+                return block_message(key)
+    return _rewrites[key]
@@ -0,0 +1,175 @@
+"""
+Clause extraction: pure functions from document text to clause dicts.
+
+Nothing here touches the clause store or any global state, so process pool
+workers (see DocumentProcessor.process_batch) can import it without
+constructing the app's DocumentProcessor.
+"""
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List
+
+# Numbered section marker ("\n12. "), see split_into_sections
+SECTION_RE = re.compile(r'\n\d+\.\s+')
+
+# Streaming splitter limits (iter_sections)
+STREAM_DETECT_CHARS = int(os.getenv("STREAM_DETECT_CHARS", str(1024 * 1024)))
+STREAM_MAX_SECTION_CHARS = int(os.getenv("STREAM_MAX_SECTION_CHARS", str(256 * 1024)))
+
+def extract_clauses_from_text(text: str, document_name: str, sensitivity: str = "public") -> List[Dict[str, Any]]:
+    """
+    Extract clauses from document text using pattern matching
+    This is a simple implementation - could be enhanced with NLP
+    """
+    clauses = []
+
+    # Split text into sections based on numbered items or clear breaks
+    sections = split_into_sections(text)
+
+    for i, section in enumerate(sections):
+        if section.strip():
+            clause_data = analyze_clause(section, document_name, sensitivity)
+            if clause_data:
+                clauses.append(clause_data)
+
+    return clauses
+
+def split_into_sections(text: str) -> List[str]:
+    """Split text into meaningful sections"""
+    # Split by numbered sections (1., 2., etc.)
+    numbered_sections = SECTION_RE.split(text)
+
+    # If no numbered sections, split by paragraphs
+    if len(numbered_sections) <= 1:
+        numbered_sections = text.split('\n\n')
+
+    # Clean up sections
+    sections = []
+    for section in numbered_sections:
+        cleaned = section.strip()
+        if len(cleaned) > 20:  # Only keep substantial sections
+            sections.append(cleaned)
+
+    return sections
+
+def iter_sections(chunks: Iterable[str], detect_chars: int = None,
+                  max_section_chars: int = None) -> Iterator[str]:
+    """
+    Streaming split_into_sections: yields the same sections from text
+    arriving in chunks, holding only the current section in memory.
+
+    Text is buffered until a numbered marker shows up (numbered mode) or
+    detect_chars pass without one (paragraph mode); a document that ends
+    before either is split exactly like split_into_sections. A marker
+    or blank line straddling two chunks is still found, because only
+    separators that cannot grow with more input are acted on. A section
+    longer than max_section_chars is cut at its last newline before the
+    limit to keep memory bounded.
+    """
+    detect_chars = detect_chars or STREAM_DETECT_CHARS
+    max_section_chars = max_section_chars or STREAM_MAX_SECTION_CHARS
+    separator = None
+    buffer = ""
+
+    def cleaned(section):
+        section = section.strip()
+        return section if len(section) > 20 else None
+
+    for chunk in chunks:
+        buffer += chunk
+        if separator is None:
+            if SECTION_RE.search(buffer):
+                separator = SECTION_RE
+            elif len(buffer) > detect_chars:
+                separator = re.compile(r'\n\n')
+            else:
+                continue
+
+        # Separators touching the end of the buffer may still grow
+        pos = 0
+        for match in separator.finditer(buffer):
+            if match.end() >= len(buffer):
+                break
+            section = cleaned(buffer[pos:match.start()])
+            if section:
+                yield section
+            pos = match.end()
+        buffer = buffer[pos:]
+
+        while len(buffer) > max_section_chars:
+            cut = buffer.rfind("\n", 1, max_section_chars)
+            cut = cut if cut > 0 else max_section_chars
+            section = cleaned(buffer[:cut])
+            if section:
+                yield section
+            buffer = buffer[cut:]
+
+    if separator is None:
+        yield from split_into_sections(buffer)
+        return
+    for section in separator.split(buffer):
+        section = cleaned(section)
+        if section:
+            yield section
+
+def analyze_clause(clause_text: str, document_name: str, sensitivity: str) -> Dict[str, Any]:
+    """Analyze a clause and determine its properties"""
+    clause_lower = clause_text.lower()
+
+    # Determine clause type and sensitivity based on content
+    clause_type = determine_clause_type(clause_lower)
+    final_sensitivity = determine_sensitivity(clause_lower, sensitivity)
+
+    return {
+        "clause": clause_text[:200] + "..." if len(clause_text) > 200 else clause_text,
+        "full_text": clause_text,
+        "sensitivity": final_sensitivity,
+        "type": clause_type,
+        "document": document_name,
+        "timestamp": datetime.now().isoformat()
+    }
+
+def determine_clause_type(clause_text: str) -> str:
+    """Determine the type of clause based on content"""
+    if any(word in clause_text for word in ['salary', 'compensation', 'pay', 'bonus', 'equity']):
+        return "compensation"
+    elif any(word in clause_text for word in ['vacation', 'pto', 'sick', 'holiday', 'leave']):
+        return "benefits"
+    elif any(word in clause_text for word in ['confidential', 'proprietary', 'trade secret', 'non-disclosure']):
+        return "confidentiality"
+    elif any(word in clause_text for word in ['termination', 'notice', 'severance']):
+        return "termination"
+    elif any(word in clause_text for word in ['duties', 'responsibilities', 'job', 'position']):
+        return "job_description"
+    elif any(word in clause_text for word in ['location', 'hours', 'work', 'office']):
+        return "work_conditions"
+    else:
+        return "general"
+
+def determine_sensitivity(clause_text: str, default_sensitivity: str) -> str:
+    """Determine sensitivity level based on content"""
+    # Check for highly sensitive financial information
+    if any(word in clause_text for word in ['$', 'salary', 'bonus', 'equity', 'stock', 'rsu']):
+        return "protected"
+
+    # Check for confidential information
+    if any(word in clause_text for word in ['confidential', 'proprietary', 'trade secret', 'personal']):
+        return "protected"
+
+    # Check for public information
+    if any(word in clause_text for word in ['job title', 'start date', 'location', 'hours', 'benefits']):
+        return "public"
+
+    return default_sensitivity
+
+def extract_document(text: str, document_name: str, sensitivity: str = "public") -> Dict[str, Any]:
+    """
+    Process pool entry point: extract one document and report the outcome
+    instead of raising, so one bad document does not fail a whole batch.
+    """
+    try:
+        clauses = extract_clauses_from_text(text, document_name, sensitivity)
+        return {"document": document_name, "success": True, "clauses": clauses, "bytes": len(text)}
+    except Exception as e:
+        return {"document": document_name, "success": False, "error": str(e), "clauses": [], "bytes": len(text)}
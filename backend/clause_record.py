@@ -0,0 +1,126 @@
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, Optional, Union
+
+from clause_store import COLUMNS
+
+# Length of the "clause" preview cut from full_text (see DocumentProcessor._analyze_clause)
+PREVIEW_LENGTH = 200
+
+_COLUMN_SET = frozenset(COLUMNS)
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+def preview(full_text: str) -> str:
+    return full_text[:PREVIEW_LENGTH] + "..." if len(full_text) > PREVIEW_LENGTH else full_text
+
+def encode_timestamp(value: Optional[str]) -> Union[int, str, None]:
+    """
+    Naive ISO timestamps become microseconds since the epoch (a small int
+    instead of a ~75-byte str). Anything that would not format back to
+    exactly the same string is kept as-is.
+    """
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return value
+    if parsed.tzinfo is not None or parsed.isoformat() != value:
+        return value
+    return (parsed - _EPOCH) // _MICROSECOND
+
+def decode_timestamp(value: Union[int, str, None]) -> Optional[str]:
+    if isinstance(value, int):
+        return (_EPOCH + value * _MICROSECOND).isoformat()
+    return value
+
+class ClauseRecord:
+    """
+    Compact, read-only clause with the same key access as the clause dicts
+    it replaces (record["clause"], record.get("full_text", ...), "x" in record).
+
+    The preview is computed from full_text on access instead of being stored
+    twice, the categorical fields are interned so a million clauses share a
+    handful of strings, and timestamps are stored as integers. Keys that were
+    absent from the source dict stay absent.
+    """
+
+    __slots__ = ("full_text", "_clause", "sensitivity", "type", "document", "_timestamp", "extra")
+
+    def __init__(self, clause: Optional[str] = None, full_text: Optional[str] = None,
+                 sensitivity: Optional[str] = None, type: Optional[str] = None,
+                 document: Optional[str] = None, timestamp: Optional[str] = None,
+                 extra: Optional[Dict[str, Any]] = None):
+        self.full_text = full_text
+        # Only kept when it is not the preview of full_text (e.g. legacy clauses)
+        self._clause = None if full_text is not None and clause == preview(full_text) else clause
+        self.sensitivity = sys.intern(sensitivity) if sensitivity is not None else None
+        self.type = sys.intern(type) if type is not None else None
+        self.document = sys.intern(document) if document is not None else None
+        self._timestamp = encode_timestamp(timestamp)
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, clause: Dict[str, Any]) -> "ClauseRecord":
+        get = clause.get
+        extra = None
+        if not _COLUMN_SET.issuperset(clause):
+            extra = {k: v for k, v in clause.items() if k not in _COLUMN_SET}
+        return cls(get("clause"), get("full_text"), get("sensitivity"), get("type"),
+                   get("document"), get("timestamp"), extra)
+
+    @property
+    def clause(self) -> Optional[str]:
+        if self._clause is None and self.full_text is not None:
+            return preview(self.full_text)
+        return self._clause
+
+    @property
+    def timestamp(self) -> Optional[str]:
+        return decode_timestamp(self._timestamp)
+
+    def keys(self) -> Iterator[str]:
+        for column in COLUMNS:
+            if getattr(self, column) is not None:
+                yield column
+        if self.extra:
+            yield from self.extra
+
+    def __getitem__(self, key: str) -> Any:
+        if key in COLUMNS:
+            value = getattr(self, key)
+        elif self.extra and key in self.extra:
+            return self.extra[key]
+        else:
+            value = None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        if key in COLUMNS:
+            return getattr(self, key) is not None
+        return bool(self.extra) and key in self.extra
+
+    def items(self):
+        return ((key, self[key]) for key in self.keys())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.items())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ClauseRecord):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"ClauseRecord({self.to_dict()!r})"
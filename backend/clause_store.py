@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Known clause fields get their own column; anything else (e.g. legacy
+# "vendor"/"doc_id" keys) is kept in the JSON "extra" column.
+COLUMNS = ("clause", "full_text", "sensitivity", "type", "document", "timestamp")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clauses (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    clause      TEXT NOT NULL,
+    full_text   TEXT,
+    sensitivity TEXT NOT NULL,
+    type        TEXT,
+    document    TEXT,
+    timestamp   TEXT,
+    extra       TEXT,
+    content_hash TEXT,
+    ref_count   INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS clause_documents (
+    content_hash TEXT NOT NULL,
+    document     TEXT NOT NULL,
+    UNIQUE (content_hash, document)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Bumped when an existing database needs upgrading (see _upgrade_schema)
+SCHEMA_VERSION = 3
+
+def content_hash(clause: Dict[str, Any]) -> str:
+    """
+    Identity of a clause for deduplication: its text with case and
+    whitespace normalized, plus its sensitivity, so the same text uploaded
+    as public and as protected is kept as two clauses.
+    """
+    text = clause.get("full_text") or clause.get("clause") or ""
+    normalized = " ".join(text.casefold().split())
+    return hashlib.sha256(f"{clause.get('sensitivity')}\0{normalized}".encode("utf-8")).hexdigest()
+
+class ClauseStore:
+    """
+    Append-only clause storage backed by SQLite in WAL mode.
+
+    Each ingest appends only its new rows inside a single transaction, so
+    write cost is proportional to the document rather than the corpus and a
+    crash can never leave a half-written store behind.
+
+    Clauses are content-addressed (see content_hash): appending a clause
+    that is already stored only bumps its ref_count. Every document a
+    clause was ingested from is recorded in clause_documents, so a clause
+    shared by several documents still belongs to each of them.
+    """
+
+    def __init__(self, db_file: str, legacy_json: Optional[str] = None):
+        self.db_file = db_file
+        directory = os.path.dirname(db_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._upgrade_schema()
+        self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS clauses_content_hash ON clauses (content_hash)")
+
+        if legacy_json:
+            self._migrate_json(legacy_json)
+
+    def _migrate_json(self, path: str) -> None:
+        """Import a legacy contract.json once, on first start"""
+        if self.get_meta("migrated_from") is not None or not os.path.exists(path):
+            return
+        with open(path, "r") as f:
+            clauses = json.load(f)
+        added = self.append(clauses, meta={"migrated_from": path})
+        print(f"Migrated {len(clauses)} clauses ({len(added)} unique) from {path} to {self.db_file}")
+
+    def _upgrade_schema(self) -> None:
+        """
+        Bring an older database up to date in one transaction. Version 1 (no
+        content hashes): add the hash and ref_count columns, hash every row
+        and compact duplicates into the oldest copy. Version 2: fill
+        clause_documents from the stored clauses.
+        """
+        version = int(self.get_meta("schema_version") or 1)
+        if version >= SCHEMA_VERSION:
+            return
+        duplicates = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if version < 2:
+                    duplicates = self._compact_duplicates()
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO clause_documents (content_hash, document) "
+                    "SELECT content_hash, document FROM clauses WHERE document IS NOT NULL ORDER BY id"
+                )
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO clause_documents (content_hash, document) VALUES (?, ?)",
+                    [(digest, document) for _, digest, document in duplicates if document is not None],
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if duplicates:
+            print(f"Compacted {len(duplicates)} duplicate clauses in {self.db_file}")
+
+    def _compact_duplicates(self) -> List[tuple]:
+        """
+        Version 1 → 2 (inside _upgrade_schema's transaction). Returns the
+        deleted duplicates as (row id, content hash, document).
+        """
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(clauses)")}
+        if "content_hash" not in columns:
+            self._conn.execute("ALTER TABLE clauses ADD COLUMN content_hash TEXT")
+        if "ref_count" not in columns:
+            self._conn.execute("ALTER TABLE clauses ADD COLUMN ref_count INTEGER NOT NULL DEFAULT 1")
+
+        first: Dict[str, int] = {}
+        refs: Dict[int, int] = {}
+        duplicates = []
+        rows = self._conn.execute(
+            f"SELECT id, {', '.join(COLUMNS)}, extra, ref_count FROM clauses ORDER BY id"
+        ).fetchall()
+        for row in rows:
+            digest = content_hash(self._from_row(row[1:-1]))
+            if digest in first:
+                refs[first[digest]] += row[-1]
+                duplicates.append((row[0], digest, row[1 + COLUMNS.index("document")]))
+            else:
+                first[digest] = row[0]
+                refs[row[0]] = row[-1]
+        self._conn.executemany("DELETE FROM clauses WHERE id = ?", [(row_id,) for row_id, _, _ in duplicates])
+        self._conn.executemany(
+            "UPDATE clauses SET content_hash = ?, ref_count = ? WHERE id = ?",
+            [(digest, refs[row_id], row_id) for digest, row_id in first.items()],
+        )
+        return duplicates
+
+    @staticmethod
+    def _to_row(clause: Dict[str, Any]) -> tuple:
+        extra = {k: v for k, v in clause.items() if k not in COLUMNS}
+        return tuple(clause.get(column) for column in COLUMNS) + (json.dumps(extra) if extra else None,)
+
+    @staticmethod
+    def _from_row(row: tuple) -> Dict[str, Any]:
+        clause = {column: value for column, value in zip(COLUMNS, row) if value is not None}
+        if row[len(COLUMNS)]:
+            clause.update(json.loads(row[len(COLUMNS)]))
+        return clause
+
+    def append(self, clauses: Iterable[Dict[str, Any]],
+               meta: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+        """
+        Append clauses (and optional meta entries) in one transaction.
+
+        Clauses whose content hash is already stored, including repeats
+        within the same batch, only increment that row's ref_count; either
+        way the clause's document is recorded in clause_documents. Returns
+        the clauses that were actually inserted, in order.
+        """
+        clauses = list(clauses)
+        placeholders = ", ".join("?" * (len(COLUMNS) + 2))
+        # Only a content_hash conflict counts as a duplicate; any other
+        # constraint violation (e.g. a clause without text) still raises.
+        # A freshly inserted row is the only one returning ref_count 1.
+        insert = (f"INSERT INTO clauses ({', '.join(COLUMNS)}, extra, content_hash) VALUES ({placeholders}) "
+                  "ON CONFLICT (content_hash) DO UPDATE SET ref_count = ref_count + 1 RETURNING ref_count")
+        link = "INSERT OR IGNORE INTO clause_documents (content_hash, document) VALUES (?, ?)"
+        added = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for clause in clauses:
+                    digest = content_hash(clause)
+                    if self._conn.execute(insert, self._to_row(clause) + (digest,)).fetchone()[0] == 1:
+                        added.append(clause)
+                    if clause.get("document") is not None:
+                        self._conn.execute(link, (digest, clause["document"]))
+                for key, value in (meta or {}).items():
+                    self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def load_all(self, factory: Optional[Callable[[Dict[str, Any]], Any]] = None) -> List[Any]:
+        """
+        Load every clause in insertion order. factory, if given, converts
+        each clause dict as it is read, so the whole corpus never has to be
+        held as dicts at once.
+        """
+        with self._lock:
+            cursor = self._conn.execute(f"SELECT {', '.join(COLUMNS)}, extra FROM clauses ORDER BY id")
+            if factory is None:
+                return [self._from_row(row) for row in cursor]
+            return [factory(self._from_row(row)) for row in cursor]
+
+    def document_links(self, digests: Optional[Iterable[str]] = None) -> List[tuple]:
+        """
+        (content hash, stored clause's document, other document) for every
+        clause also ingested from a document other than the one stored with
+        it, in link order; optionally only for the given content hashes.
+        """
+        query = ("SELECT d.content_hash, c.document, d.document FROM clause_documents d "
+                 "JOIN clauses c ON c.content_hash = d.content_hash WHERE d.document IS NOT c.document")
+        with self._lock:
+            if digests is None:
+                return self._conn.execute(query + " ORDER BY d.rowid").fetchall()
+            links = []
+            for digest in digests:
+                links.extend(self._conn.execute(query + " AND d.content_hash = ? ORDER BY d.rowid", (digest,)))
+            return links
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM clauses").fetchone()[0]
+
+    def ref_count(self, clause: Dict[str, Any]) -> int:
+        """How many times this clause's content has been ingested (0 if never)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT ref_count FROM clauses WHERE content_hash = ?", (content_hash(clause),)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
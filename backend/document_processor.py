@@ -1,131 +1,176 @@
-import json
+import codecs
 import os
 import re
-from typing import List, Dict, Any
-from datetime import datetime
+import threading
+from collections.abc import Sequence
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional
+
+import clause_extraction
+from clause_store import ClauseStore, content_hash
+from clause_record import ClauseRecord
+from text_index import BM25Index, tokenize
+
+# Fields the processor keeps clause partitions for
+PARTITION_FIELDS = ("sensitivity", "document", "type")
+
+# Clauses persisted per batch by process_stream
+STREAM_BATCH_CLAUSES = int(os.getenv("STREAM_BATCH_CLAUSES", "500"))
+
+class ClauseView(Sequence):
+    """
+    Read-only, zero-copy view of a partition of the corpus.
+
+    Holds the contracts list, the partition's doc ids and a length fixed at
+    creation; both lists are append-only, so the view stays a consistent
+    snapshot while new clauses are ingested. With a field name it yields
+    that field (e.g. the clause text) instead of the whole ClauseRecord.
+    """
+
+    __slots__ = ("_contracts", "_ids", "_length", "_field")
+
+    def __init__(self, contracts: List[ClauseRecord], ids: List[int], field: Optional[str] = None):
+        self._contracts = contracts
+        self._ids = ids
+        self._length = len(ids)
+        self._field = field
+
+    def __len__(self) -> int:
+        return self._length
+
+    def _get(self, doc_id: int):
+        contract = self._contracts[doc_id]
+        return contract[self._field] if self._field else contract
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._get(self._ids[i]) for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("clause view index out of range")
+        return self._get(self._ids[index])
+
+    def __iter__(self):
+        for i in range(self._length):
+            yield self._get(self._ids[i])
+
+    def __repr__(self) -> str:
+        return f"ClauseView({self._length} clauses)"
 
 class DocumentProcessor:
-    def __init__(self, data_file="data/contract.json"):
+    def __init__(self, data_file="data/contract.json", db_file=None):
+        # data_file is the legacy JSON store, migrated into db_file on first start
         self.data_file = data_file
+        self.db_file = db_file or os.getenv(
+            "CLAUSE_DB", os.path.join(os.path.dirname(data_file), "contracts.db")
+        )
+        self.store = ClauseStore(self.db_file, legacy_json=data_file)
+        # Bumped on every corpus change so derived indexes know when to rebuild
+        self.version = 0
+        # Bumped only when public clauses change (drives the answer cache)
+        self.public_version = 0
+        self._listeners: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        # One index per sensitivity level so searches never touch other partitions
+        self.indexes: Dict[str, BM25Index] = {}
+        # field -> value -> doc ids, e.g. partitions["sensitivity"]["public"]
+        self.partitions: Dict[str, Dict[str, List[int]]] = {field: {} for field in PARTITION_FIELDS}
         self.load_existing_data()
+        self._index_clauses(0)
+        self._link_documents(self.store.document_links())
+    
+    def add_listener(self, callback: Callable[[], None]):
+        """Register a callback invoked after every corpus change"""
+        self._listeners.append(callback)
+    
+    def _notify(self):
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Corpus listener failed: {e}")
     
     def load_existing_data(self):
-        """Load existing contract data"""
-        if os.path.exists(self.data_file):
-            with open(self.data_file, 'r') as f:
-                self.contracts = json.load(f)
-        else:
-            self.contracts = []
-    
-    def save_data(self):
-        """Save contract data to file"""
-        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-        with open(self.data_file, 'w') as f:
-            json.dump(self.contracts, f, indent=2)
+        """Load existing contract data as compact ClauseRecords"""
+        self.contracts = self.store.load_all(ClauseRecord.from_dict)
     
-    def extract_clauses_from_text(self, text: str, document_name: str, sensitivity: str = "public") -> List[Dict[str, Any]]:
+    def _index_clauses(self, start: int):
+        """Add contracts[start:] to the per-sensitivity indexes and the partitions"""
+        for doc_id in range(start, len(self.contracts)):
+            contract = self.contracts[doc_id]
+            for field, partition in self.partitions.items():
+                partition.setdefault(contract.get(field), []).append(doc_id)
+            index = self.indexes.get(contract["sensitivity"])
+            if index is None:
+                index = self.indexes[contract["sensitivity"]] = BM25Index()
+            index.add(doc_id, contract.get("full_text") or contract["clause"])
+    
+    def _link_documents(self, links: Iterable[tuple]):
         """
-        Extract clauses from document text using pattern matching
-        This is a simple implementation - could be enhanced with NLP
+        Add stored clauses to the document partitions of the other documents
+        they were also ingested from (see ClauseStore.document_links)
         """
-        clauses = []
-        
-        # Split text into sections based on numbered items or clear breaks
-        sections = self._split_into_sections(text)
-        
-        for i, section in enumerate(sections):
-            if section.strip():
-                clause_data = self._analyze_clause(section, document_name, sensitivity)
-                if clause_data:
-                    clauses.append(clause_data)
-        
-        return clauses
+        documents = self.partitions["document"]
+        by_hash: Dict[Optional[str], Dict[str, int]] = {}
+        members: Dict[str, set] = {}
+        for digest, stored_document, document in links:
+            if stored_document not in by_hash:
+                by_hash[stored_document] = {content_hash(self.contracts[doc_id]): doc_id
+                                             for doc_id in documents.get(stored_document, [])}
+            doc_id = by_hash[stored_document].get(digest)
+            if doc_id is None:
+                continue
+            ids = documents.setdefault(document, [])
+            if document not in members:
+                members[document] = set(ids)
+            if doc_id not in members[document]:
+                ids.append(doc_id)
+                members[document].add(doc_id)
+    
+    @property
+    def public_index(self) -> BM25Index:
+        return self.indexes.setdefault("public", BM25Index())
+    
+    def save_data(self, clauses: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Append clauses to the store in a single transaction. Returns the
+        ones that were new; duplicates only bump their stored ref_count.
+        """
+        return self.store.append(clauses)
+    
+    def extract_clauses_from_text(self, text: str, document_name: str, sensitivity: str = "public") -> List[Dict[str, Any]]:
+        """Extract clauses from document text (see clause_extraction)"""
+        return clause_extraction.extract_clauses_from_text(text, document_name, sensitivity)
     
     def _split_into_sections(self, text: str) -> List[str]:
-        """Split text into meaningful sections"""
-        # Split by numbered sections (1., 2., etc.)
-        numbered_sections = re.split(r'\n\d+\.\s+', text)
-        
-        # If no numbered sections, split by paragraphs
-        if len(numbered_sections) <= 1:
-            numbered_sections = text.split('\n\n')
-        
-        # Clean up sections
-        sections = []
-        for section in numbered_sections:
-            cleaned = section.strip()
-            if len(cleaned) > 20:  # Only keep substantial sections
-                sections.append(cleaned)
-        
-        return sections
+        return clause_extraction.split_into_sections(text)
     
-    def _analyze_clause(self, clause_text: str, document_name: str, sensitivity: str) -> Dict[str, Any]:
-        """Analyze a clause and determine its properties"""
-        clause_lower = clause_text.lower()
-        
-        # Determine clause type and sensitivity based on content
-        clause_type = self._determine_clause_type(clause_lower)
-        final_sensitivity = self._determine_sensitivity(clause_lower, sensitivity)
-        
-        return {
-            "clause": clause_text[:200] + "..." if len(clause_text) > 200 else clause_text,
-            "full_text": clause_text,
-            "sensitivity": final_sensitivity,
-            "type": clause_type,
-            "document": document_name,
-            "timestamp": datetime.now().isoformat()
-        }
+    def iter_sections(self, chunks: Iterable[str], detect_chars: int = None,
+                      max_section_chars: int = None) -> Iterator[str]:
+        return clause_extraction.iter_sections(chunks, detect_chars, max_section_chars)
     
-    def _determine_clause_type(self, clause_text: str) -> str:
-        """Determine the type of clause based on content"""
-        if any(word in clause_text for word in ['salary', 'compensation', 'pay', 'bonus', 'equity']):
-            return "compensation"
-        elif any(word in clause_text for word in ['vacation', 'pto', 'sick', 'holiday', 'leave']):
-            return "benefits"
-        elif any(word in clause_text for word in ['confidential', 'proprietary', 'trade secret', 'non-disclosure']):
-            return "confidentiality"
-        elif any(word in clause_text for word in ['termination', 'notice', 'severance']):
-            return "termination"
-        elif any(word in clause_text for word in ['duties', 'responsibilities', 'job', 'position']):
-            return "job_description"
-        elif any(word in clause_text for word in ['location', 'hours', 'work', 'office']):
-            return "work_conditions"
-        else:
-            return "general"
-    
-    def _determine_sensitivity(self, clause_text: str, default_sensitivity: str) -> str:
-        """Determine sensitivity level based on content"""
-        # Check for highly sensitive financial information
-        if any(word in clause_text for word in ['$', 'salary', 'bonus', 'equity', 'stock', 'rsu']):
-            return "protected"
-        
-        # Check for confidential information
-        if any(word in clause_text for word in ['confidential', 'proprietary', 'trade secret', 'personal']):
-            return "protected"
-        
-        # Check for public information
-        if any(word in clause_text for word in ['job title', 'start date', 'location', 'hours', 'benefits']):
-            return "public"
-        
-        return default_sensitivity
+    def _analyze_clause(self, clause_text: str, document_name: str, sensitivity: str) -> Dict[str, Any]:
+        return clause_extraction.analyze_clause(clause_text, document_name, sensitivity)
     
-    def process_document(self, text: str, filename: str, sensitivity: str = "public") -> Dict[str, Any]:
-        """Process a complete document and add it to the knowledge base"""
+    def process_document(self, text: str, filename: str, sensitivity: str = "public",
+                         apply: Callable = None) -> Dict[str, Any]:
+        """Process a complete document and add it to the knowledge base (see _ingest for apply)"""
         try:
             # Extract clauses from the document
             clauses = self.extract_clauses_from_text(text, filename, sensitivity)
             
-            # Add clauses to the contract data
-            self.contracts.extend(clauses)
-            
-            # Save updated data
-            self.save_data()
+            added = self._ingest(clauses, apply)
+            if added:
+                self._notify()
             
+            duplicates = len(clauses) - len(added)
             return {
                 "success": True,
-                "clauses_added": len(clauses),
+                "clauses_added": len(added),
+                "duplicates": duplicates,
                 "document": filename,
                 "message": f"Successfully processed {len(clauses)} clauses from {filename}"
+                           + (f" ({duplicates} already known)" if duplicates else "")
             }
             
         except Exception as e:
@@ -135,25 +180,182 @@ class DocumentProcessor:
                 "message": f"Failed to process document {filename}"
             }
     
-    def get_public_clauses(self) -> List[str]:
-        """Get all public clauses for context"""
-        return [contract["clause"] for contract in self.contracts if contract["sensitivity"] == "public"]
+    def _ingest(self, clauses: List[Dict[str, Any]], apply: Callable = None) -> List[Dict[str, Any]]:
+        """
+        Persist, then add and index, one batch of clauses; returns the new ones.
+        
+        The store work runs on the calling thread. The in-memory update goes
+        through apply(fn, *args) when given, e.g. anyio.from_thread.run_sync
+        from a worker thread, so the corpus and indexes only ever change on
+        the event loop that searches them. It runs under self._lock, so
+        nothing on that loop may take the lock.
+        """
+        with self._lock:
+            # Persist first so memory never holds clauses the store lost
+            added = self.save_data(clauses)
+            
+            # Add only new clauses; re-uploads leave the corpus (and every
+            # index, guard and cache derived from it) untouched
+            records = [ClauseRecord.from_dict(clause) for clause in added]
+            
+            # Clauses already stored under another document still belong to this one
+            links = []
+            if len(added) < len(clauses):
+                new = {id(clause) for clause in added}
+                links = self.store.document_links(
+                    {content_hash(clause) for clause in clauses if id(clause) not in new}
+                )
+            
+            if records or links:
+                if apply is None:
+                    self._apply_ingest(records, links)
+                else:
+                    apply(self._apply_ingest, records, links)
+        return added
     
-    def get_protected_clauses(self) -> List[str]:
-        """Get all protected clauses"""
-        return [contract["clause"] for contract in self.contracts if contract["sensitivity"] == "protected"]
+    def _apply_ingest(self, records: List[ClauseRecord], links: List[tuple]):
+        """In-memory half of _ingest: extend the corpus, indexes and partitions"""
+        if records:
+            start = len(self.contracts)
+            self.contracts.extend(records)
+            self._index_clauses(start)
+            self.version += 1
+            if any(record["sensitivity"] == "public" for record in records):
+                self.public_version += 1
+        self._link_documents(links)
     
-    def search_clauses(self, query: str, include_protected: bool = False) -> List[Dict[str, Any]]:
-        """Search for relevant clauses based on query"""
-        query_lower = query.lower()
-        relevant_clauses = []
+    def process_stream(self, chunks: Iterable, filename: str, sensitivity: str = "public",
+                       batch_size: int = None, apply: Callable = None) -> Dict[str, Any]:
+        """
+        Streaming process_document for very large documents. chunks may be
+        str or UTF-8 bytes; clauses are persisted every batch_size clauses,
+        so memory is bounded by one section plus one batch. Listeners are
+        notified once, at the end. See _ingest for apply.
+        """
+        batch_size = batch_size or STREAM_BATCH_CLAUSES
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        received = 0
+        
+        def text_chunks():
+            nonlocal received
+            for chunk in chunks:
+                if isinstance(chunk, bytes):
+                    received += len(chunk)
+                    chunk = decoder.decode(chunk)
+                else:
+                    received += len(chunk)
+                yield chunk
+            yield decoder.decode(b"", final=True)
+        
+        extracted = added = 0
+        try:
+            batch = []
+            for section in self.iter_sections(text_chunks()):
+                batch.append(self._analyze_clause(section, filename, sensitivity))
+                if len(batch) >= batch_size:
+                    extracted += len(batch)
+                    added += len(self._ingest(batch, apply))
+                    batch = []
+            if batch:
+                extracted += len(batch)
+                added += len(self._ingest(batch, apply))
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "clauses_added": added,
+                "message": f"Failed to process document {filename} after {added} clauses"
+            }
+        finally:
+            if added:
+                self._notify()
+        
+        duplicates = extracted - added
+        return {
+            "success": True,
+            "clauses_added": added,
+            "duplicates": duplicates,
+            "bytes": received,
+            "document": filename,
+            "message": f"Successfully processed {extracted} clauses from {filename}"
+                       + (f" ({duplicates} already known)" if duplicates else "")
+        }
+    
+    def process_batch(self, extracted: List[Dict[str, Any]], apply: Callable = None) -> List[Dict[str, Any]]:
+        """
+        Merge many documents already run through
+        clause_extraction.extract_document (e.g. in a process pool): one
+        store transaction, one index update and one listener notification
+        for the whole batch. Returns per-document results in input order.
+        See _ingest for apply.
+        """
+        clauses = [clause for document in extracted for clause in document["clauses"]]
+        added = {id(clause) for clause in self._ingest(clauses, apply)} if clauses else set()
+        if added:
+            self._notify()
+        
+        results = []
+        for document in extracted:
+            result = {
+                "document": document["document"],
+                "success": document["success"],
+                "clauses_extracted": len(document["clauses"]),
+                "clauses_added": sum(1 for clause in document["clauses"] if id(clause) in added),
+                "bytes": document["bytes"],
+            }
+            result["duplicates"] = result["clauses_extracted"] - result["clauses_added"]
+            if not document["success"]:
+                result["error"] = document["error"]
+            results.append(result)
+        return results
+    
+    def partition(self, field: str, value: str, clause_field: Optional[str] = None) -> ClauseView:
+        """
+        Read-only view of the clauses whose `field` (sensitivity, document or
+        type) equals `value`, in ingest order. O(1): nothing is copied.
+        """
+        return ClauseView(self.contracts, self.partitions[field].get(value, []), clause_field)
+    
+    def clauses_by_document(self, document: str) -> ClauseView:
+        return self.partition("document", document)
+    
+    def clauses_by_type(self, clause_type: str) -> ClauseView:
+        return self.partition("type", clause_type)
+    
+    def get_public_clauses(self) -> Sequence:
+        """Get all public clauses for context (read-only view)"""
+        return self.partition("sensitivity", "public", "clause")
+    
+    def rank_public_clauses(self, query: str, top_k: int = 10) -> List[str]:
+        """Get the public clauses most relevant to a query, best first"""
+        return [self.contracts[doc_id]["clause"] for doc_id, _ in self.public_index.search(query, top_k)]
+    
+    def get_protected_clauses(self) -> Sequence:
+        """Get all protected clauses (read-only view)"""
+        return self.partition("sensitivity", "protected", "clause")
+    
+    def search_clauses(self, query: str, include_protected: bool = False, mode: str = "or",
+                       limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Search for relevant clauses based on query
+        
+        Words are matched as whole tokens; "quoted text" is matched as a phrase.
+        mode="or" returns clauses matching any word/phrase, mode="and" all of them.
+        """
+        phrases = re.findall(r'"([^"]+)"', query)
+        terms = tokenize(re.sub(r'"[^"]*"', " ", query))
         
-        for contract in self.contracts:
-            if contract["sensitivity"] == "public" or (include_protected and contract["sensitivity"] == "protected"):
-                if any(word in contract["full_text"].lower() for word in query_lower.split()):
-                    relevant_clauses.append(contract)
+        partitions = ["public", "protected"] if include_protected else ["public"]
+        doc_ids = []
+        for sensitivity in partitions:
+            index = self.indexes.get(sensitivity)
+            if index is not None:
+                doc_ids.extend(index.query(terms, phrases, mode=mode, limit=limit))
         
-        return relevant_clauses
+        doc_ids.sort()
+        if limit is not None:
+            doc_ids = doc_ids[:limit]
+        return [self.contracts[doc_id].to_dict() for doc_id in doc_ids]
 
 # Global instance
 doc_processor = DocumentProcessor()
@@ -1,57 +1,202 @@
-from openai import OpenAI
+from openai import AsyncOpenAI
+import openai
+import hashlib
+import httpx
+import json
 import os
 from dotenv import load_dotenv
+
+from cache import LRUCache, DiskCache, TieredCache, normalize_query
+from preclassifier import preclassify
+from resilience import CircuitBreaker, ResilientCaller
+from llm_backends import resolve_backend
 load_dotenv()
 
-client = OpenAI(
-    api_key=os.getenv("FRIENDLI_TOKEN"),
-    base_url="https://api.friendli.ai/serverless/v1",
+# Selected with LLM_BACKEND (friendli by default, "stub" for offline runs)
+BACKEND = resolve_backend()
+BASE_URL = BACKEND["base_url"]
+
+# One pooled HTTP client shared by every async request in this worker, so
+# concurrent /ask calls reuse keep-alive connections instead of opening new ones.
+_http_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "200")),
+        max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE", "50")),
+        keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30")),
+    ),
+    timeout=httpx.Timeout(float(os.getenv("LLM_TIMEOUT", "30")), connect=5.0),
 )
 
-MODEL = os.getenv("FRIENDLI_MODEL", "meta-llama-3.1-8b-instruct")
+async_client = AsyncOpenAI(
+    api_key=BACKEND["api_key"],
+    base_url=BASE_URL,
+    http_client=_http_client,
+    max_retries=0,  # retries are handled by the ResilientCaller layer below
+)
 
-def _chat(messages, temperature=0.0):
-    completion = client.chat.completions.create(
-        model=MODEL,
-        messages=messages,
-        temperature=temperature,
-    )
-    return completion.choices[0].message.content
-
-def classify_query(query: str) -> dict:
-    system = (
-        "You are a compliance classifier. "
-        "Given a user query about contracts, label as JSON: "
-        '{"label":"safe|sensitive|exfiltration","severity":"low|medium|high","reasons":["..."]}. '
-        "Sensitive = requests for penalties, discounts, NDA-protected terms. "
-        "Exfiltration = requests to dump full text, list all clauses, verbatim output."
+MODEL = BACKEND["model"]
+
+CLASSIFY_SYSTEM = (
+    "You are a compliance classifier. "
+    "Given a user query about contracts, label as JSON: "
+    '{"label":"safe|sensitive|exfiltration","severity":"low|medium|high","reasons":["..."]}. '
+    "Sensitive = requests for penalties, discounts, NDA-protected terms. "
+    "Exfiltration = requests to dump full text, list all clauses, verbatim output."
+)
+
+GENERATE_SYSTEM = (
+    "You are a contract assistant. Answer ONLY from the provided context. "
+    "If the information appears protected or not present in context, say: "
+    "\"This information is protected or not available.\" Never invent details."
+)
+
+BLOCK_SYSTEM = "Rewrite a polite, compliance-approved message explaining why content cannot be disclosed."
+
+# Pre-guard decisions keyed on the normalized query. The shared disk tier is
+# only enabled when CLASSIFY_CACHE_DB points at a file.
+_classify_ttl = float(os.getenv("CLASSIFY_CACHE_TTL", "3600"))
+classify_cache = TieredCache(
+    LRUCache(max_entries=int(os.getenv("CLASSIFY_CACHE_SIZE", "4096")), ttl=_classify_ttl),
+    DiskCache(os.getenv("CLASSIFY_CACHE_DB"), ttl=_classify_ttl) if os.getenv("CLASSIFY_CACHE_DB") else None,
+)
+
+# Which tier answered each pre-guard classification
+classify_tiers = {"heuristic": 0, "model": 0, "cache": 0, "llm": 0}
+
+def classify_local(query: str):
+    """Local heuristic/model tiers, then the cache; None means ask the LLM"""
+    decision = preclassify(query)
+    if decision is not None:
+        classify_tiers[decision["tier"]] += 1
+        return decision
+    cached = classify_cache.get(_classify_key(query))
+    if cached is not None:
+        classify_tiers["cache"] += 1
+        return dict(cached)
+    return None
+
+def _classify_key(query: str) -> str:
+    # Model and prompt are part of the key, so changing either invalidates old entries
+    namespace = hashlib.sha256(f"{MODEL}\0{CLASSIFY_SYSTEM}".encode()).hexdigest()[:16]
+    return f"{namespace}:{normalize_query(query)}"
+
+# Errors worth retrying (and counting against the circuit breaker)
+RETRYABLE = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    httpx.TransportError,
+)
+
+# One breaker per endpoint; one caller per call kind so each has its own
+# latency budget and hedging history.
+breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+    reset_timeout=float(os.getenv("LLM_BREAKER_RESET", "30")),
+)
+
+def _caller(name: str, budget_env: str, default_budget: str) -> ResilientCaller:
+    return ResilientCaller(
+        name,
+        budget=float(os.getenv(budget_env, default_budget)),
+        breaker=breaker,
+        retries=int(os.getenv("LLM_RETRIES", "2")),
+        backoff_base=float(os.getenv("LLM_BACKOFF_BASE", "0.2")),
+        backoff_max=float(os.getenv("LLM_BACKOFF_MAX", "2.0")),
+        retryable=RETRYABLE,
+        hedge=os.getenv("LLM_HEDGE", "0") == "1",
+        hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95")),
+        # Unset: each attempt gets an equal share of the budget
+        attempt_timeout=float(os.getenv("LLM_ATTEMPT_TIMEOUT")) if os.getenv("LLM_ATTEMPT_TIMEOUT") else None,
     )
-    msg = [{"role":"system","content":system}, {"role":"user","content":query}]
-    raw = _chat(msg)
+
+callers = {
+    "classify": _caller("classify", "LLM_CLASSIFY_BUDGET", "8"),
+    "generate": _caller("generate", "LLM_GENERATE_BUDGET", "25"),
+    # Opening a stream only waits for the first byte, so its latencies (and
+    # hedge delay) must not mix with full generations
+    "stream": _caller("stream", "LLM_STREAM_BUDGET", "25"),
+    "block": _caller("block", "LLM_BLOCK_BUDGET", "8"),
+}
+
+def llm_stats():
+    return {
+        "breaker": {"state": breaker.state, "failures": breaker.failures, "trips": breaker.trips},
+        **{name: caller.snapshot() for name, caller in callers.items()},
+    }
+
+async def _chat_async(messages, temperature=0.0, kind="generate"):
+    async def once():
+        completion = await async_client.chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            temperature=temperature,
+        )
+        return completion.choices[0].message.content
+    return await callers[kind].call(once)
+
+async def aclose():
+    """Close the shared async connection pool (call on app shutdown)"""
+    await async_client.close()
+
+def _classify_messages(query: str):
+    return [{"role":"system","content":CLASSIFY_SYSTEM}, {"role":"user","content":query}]
+
+def _parse_classification(raw: str):
+    """Returns (decision, parsed_ok)"""
     # be defensive if model returns text; try eval-safe parse
-    import json
     try:
         out = json.loads(raw)
+        return out, isinstance(out, dict)
     except Exception:
-        out = {"label":"safe","severity":"low","reasons":[f"fallback_parse:{raw[:60]}"]}
-    return out
+        return {"label":"safe","severity":"low","reasons":[f"fallback_parse:{raw[:60]}"]}, False
 
-def generate_from_context(context: str, question: str) -> str:
-    system = (
-        "You are a contract assistant. Answer ONLY from the provided context. "
-        "If the information appears protected or not present in context, say: "
-        "\"This information is protected or not available.\" Never invent details."
-    )
-    msgs = [
-        {"role":"system","content":system},
+def _generate_messages(context: str, question: str):
+    return [
+        {"role":"system","content":GENERATE_SYSTEM},
         {"role":"user","content":f"Context:\n{context}\n\nQuestion: {question}"}
     ]
-    return _chat(msgs, temperature=0.0)
 
-def polite_block(reason: str) -> str:
-    system = "Rewrite a polite, compliance-approved message explaining why content cannot be disclosed."
-    msgs = [
-        {"role":"system","content":system},
+def _block_messages(reason: str):
+    return [
+        {"role":"system","content":BLOCK_SYSTEM},
         {"role":"user","content":f"Reason: {reason}"}
     ]
-    return _chat(msgs, temperature=0.2)
+
+async def classify_remote_async(query: str) -> dict:
+    """LLM tier only (callers normally go through classify_query_async)"""
+    classify_tiers["llm"] += 1
+    key = _classify_key(query)
+    out, ok = _parse_classification(await _chat_async(_classify_messages(query), kind="classify"))
+    if ok:
+        classify_cache.set(key, dict(out))
+    return out
+
+async def classify_query_async(query: str) -> dict:
+    local = classify_local(query)
+    if local is not None:
+        return local
+    return await classify_remote_async(query)
+
+async def generate_from_context_async(context: str, question: str) -> str:
+    return await _chat_async(_generate_messages(context, question), temperature=0.0)
+
+async def stream_from_context_async(context: str, question: str):
+    """Yield answer text deltas as the model produces them"""
+    # Only opening the stream is retried; a stream that fails midway is not replayed
+    stream = await callers["stream"].call(lambda: async_client.chat.completions.create(
+        model=MODEL,
+        messages=_generate_messages(context, question),
+        temperature=0.0,
+        stream=True,
+    ))
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        await stream.close()
+
+async def polite_block_async(reason: str) -> str:
+    return await _chat_async(_block_messages(reason), temperature=0.2, kind="block")
@@ -1,7 +1,15 @@
-import os, json, re, yaml
+import os, yaml, threading
 from document_processor import doc_processor
+from matcher import PatternMatcher
 
-RULES = yaml.safe_load(open(os.path.join("rules","contract_policies.yaml")))
+POLICY_FILE = os.path.join("rules","contract_policies.yaml")
+
+PROTECTED = "protected"
+RULE = "rule"
+
+def load_rules(path=POLICY_FILE):
+    with open(path) as f:
+        return yaml.safe_load(f) or {}
 
 def get_protected_clauses():
     return doc_processor.get_protected_clauses()
@@ -9,27 +17,316 @@ def get_protected_clauses():
 def get_public_clauses():
     return doc_processor.get_public_clauses()
 
-def public_context():
-    public_clauses = get_public_clauses()
-    if public_clauses:
-        return "\n- " + "\n- ".join(public_clauses)
-    else:
+def _estimate_tokens(text):
+    # ~4 characters per token is close enough for budgeting prompts
+    return len(text) // 4 + 1
+
+def public_context(query: str = "", top_k: int = None, token_budget: int = None):
+    """
+    Build the prompt context from the public clauses most relevant to the
+    query, capped at top_k clauses and roughly token_budget tokens.
+    """
+    if top_k is None:
+        top_k = int(os.getenv("CONTEXT_TOP_K", "8"))
+    if token_budget is None:
+        token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+    clauses = doc_processor.rank_public_clauses(query, top_k) if query else []
+    if not clauses:
+        # Nothing matched the query: fall back to the most recent public clauses
+        public_clauses = get_public_clauses()
+        clauses = list(reversed(public_clauses[-top_k:]))
+    if not clauses:
         return "\n- No public contract information available yet. Please upload documents first."
 
+    selected, used = [], 0
+    for clause in clauses:
+        cost = _estimate_tokens(clause)
+        if selected and used + cost > token_budget:
+            break
+        selected.append(clause)
+        used += cost
+    return "\n- " + "\n- ".join(selected)
+
+def build_matcher(protected_clauses, rules):
+    """Compile protected clauses and every rule keyword into one automaton."""
+    patterns = [(clause, (PROTECTED, i)) for i, clause in enumerate(protected_clauses)]
+    for r, rule in enumerate(rules.get("redactions", [])):
+        for k, key in enumerate(rule["match"]):
+            patterns.append((key, (RULE, r, k)))
+    return PatternMatcher(patterns)
+
+def _redact(output, spans):
+    # Non-overlapping, left-to-right replacement (same as re.sub)
+    parts, pos = [], 0
+    for start, end in sorted(spans):
+        if start < pos:
+            continue
+        parts.append(output[pos:start])
+        parts.append("[REDACTED]")
+        pos = end
+    parts.append(output[pos:])
+    return "".join(parts)
+
+def decide(output, matches, matcher, protected_clauses, rules):
+    """
+    Turn automaton hits into a blocked/redacted/pass decision.
+
+    Priority mirrors the original sequential scan: the first protected clause
+    (in corpus order) wins, then the first rule keyword (in policy file order)
+    whose rule action is block or redact.
+    """
+    redactions = rules.get("redactions", [])
+    hits = []
+    protected_hit = None
+    rule_hit = None
+    for m in matches:
+        payload = matcher.payloads[m.pattern_id]
+        if payload[0] == PROTECTED:
+            hits.append({"start": m.start, "end": m.end, "policy": "protected_clause", "action": "block"})
+            if protected_hit is None or payload[1] < protected_hit:
+                protected_hit = payload[1]
+        else:
+            rule = redactions[payload[1]]
+            hits.append({"start": m.start, "end": m.end, "policy": rule["name"], "action": rule.get("action")})
+            if rule.get("action") in ("block", "redact") and (rule_hit is None or payload[1:] < rule_hit):
+                rule_hit = payload[1:]
+
+    if protected_hit is not None:
+        clause = protected_clauses[protected_hit]
+        return {"action":"blocked","reason":f"Protected information overlap: {clause[:50]}...",
+                "policy":"protected_clause","matches":hits}
+
+    if rule_hit is not None:
+        rule = redactions[rule_hit[0]]
+        if rule.get("action") == "block":
+            return {"action":"blocked","reason":f"Policy {rule['name']} matched",
+                    "policy":rule["name"],"matches":hits}
+        spans = [(m.start, m.end) for m in matches
+                 if matcher.payloads[m.pattern_id] == (RULE,) + rule_hit]
+        return {"action":"redacted","reason":f"Redacted {rule['name']}", "safe_output": _redact(output, spans),
+                "policy":rule["name"],"matches":hits}
+
+    return {"action":"pass","reason":"No violation","matches":hits}
+
+class CompiledGuard:
+    """
+    Immutable, precompiled post-guard. A new instance is built whenever the
+    corpus or the policy file changes; requests only ever read a snapshot.
+    """
+
+    def __init__(self, version, corpus_version, policy_version, protected_clauses, rules):
+        self.version = version
+        self.corpus_version = corpus_version
+        self.policy_version = policy_version
+        self.protected_clauses = tuple(protected_clauses)
+        self.rules = rules
+        self.matcher = build_matcher(self.protected_clauses, rules)
+
+    def scan(self, output: str):
+        matches = self.matcher.find_all(output)
+        return decide(output, matches, self.matcher, self.protected_clauses, self.rules)
+
+class GuardRegistry:
+    """
+    Holds the current CompiledGuard and rebuilds it on a background thread
+    when the corpus version or the policy file changes.
+    """
+
+    def __init__(self, processor, policy_file=POLICY_FILE):
+        self.processor = processor
+        self.policy_file = policy_file
+        self.rules = load_rules(policy_file)
+        self.policy_version = 1
+        self._policy_mtime = self._mtime()
+        self._build_lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._stop = threading.Event()
+        self._worker = None
+        self._watcher = None
+        self.snapshot = self._build()
+        processor.add_listener(self.invalidate)
+
+    def current(self) -> CompiledGuard:
+        return self.snapshot
+
+    def _mtime(self):
+        try:
+            return os.stat(self.policy_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def _build(self) -> CompiledGuard:
+        with self._build_lock:
+            # Read the version first so a concurrent ingest is never hidden
+            # behind a snapshot that claims to be newer than it is.
+            corpus_version = self.processor.version
+            previous = getattr(self, "snapshot", None)
+            version = previous.version + 1 if previous else 1
+            guard = CompiledGuard(version, corpus_version, self.policy_version,
+                                  self.processor.get_protected_clauses(), self.rules)
+            self.snapshot = guard
+            return guard
+
+    def invalidate(self):
+        """Schedule a background rebuild (coalesces bursts of changes)."""
+        self._dirty.set()
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._rebuild_loop, name="guard-rebuild", daemon=True)
+            self._worker.start()
+
+    def _rebuild_loop(self):
+        while not self._stop.is_set():
+            if not self._dirty.wait(timeout=1.0):
+                continue
+            self._dirty.clear()
+            try:
+                self._build()
+            except Exception as e:
+                print(f"Guard rebuild failed: {e}")
+
+    def reload_policies(self) -> bool:
+        """
+        Re-read the policy file; keeps the previous rules if it is invalid.
+
+        The new rules are compiled into a guard and exercised on every rule
+        keyword before they are committed, so a file that parses but is
+        malformed (e.g. a redaction without "match") is rejected here rather
+        than breaking every later background rebuild. The file's mtime is
+        recorded either way, so the watcher reports a bad file once rather
+        than on every poll until it is edited again.
+        """
+        mtime = self._mtime()
+        self._policy_mtime = mtime
+        try:
+            rules = load_rules(self.policy_file)
+            with self._build_lock:
+                guard = CompiledGuard(self.snapshot.version + 1, self.processor.version, self.policy_version + 1,
+                                      self.processor.get_protected_clauses(), rules)
+                guard.scan(" ".join(key for rule in rules.get("redactions", []) for key in rule["match"]))
+                self.rules = rules
+                self.policy_version = guard.policy_version
+                self.snapshot = guard
+        except Exception as e:
+            print(f"Failed to reload policies: {e}")
+            return False
+        return True
+
+    def start_policy_watcher(self, interval: float = None):
+        """Poll the policy file's mtime and reload it when it changes."""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        if interval is None:
+            interval = float(os.getenv("POLICY_WATCH_INTERVAL", "2.0"))
+        self._stop.clear()
+
+        def watch():
+            while not self._stop.wait(interval):
+                if self._mtime() != self._policy_mtime:
+                    self.reload_policies()
+
+        self._watcher = threading.Thread(target=watch, name="policy-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+guard_registry = GuardRegistry(doc_processor)
+
+def current_guard() -> CompiledGuard:
+    return guard_registry.current()
+
 def scan_text(output: str):
-    # 1) direct protected overlap
-    protected_clauses = get_protected_clauses()
-    for clause in protected_clauses:
-        if clause.lower() in output.lower():
-            return {"action":"blocked","reason":f"Protected information overlap: {clause[:50]}..."}
-
-    # 2) rule keywords
-    for rule in RULES.get("redactions", []):
-        for key in rule["match"]:
-            if re.search(re.escape(key), output, flags=re.I):
-                if rule.get("action") == "block":
-                    return {"action":"blocked","reason":f"Policy {rule['name']} matched"}
-                if rule.get("action") == "redact":
-                    redacted = re.sub(re.escape(key), "[REDACTED]", output, flags=re.I)
-                    return {"action":"redacted","reason":f"Redacted {rule['name']}", "safe_output": redacted}
-    return {"action":"pass","reason":"No violation"}
+    # Single pass over the output for protected overlap + rule keywords
+    return current_guard().scan(output)
+
+class StreamGuard:
+    """
+    Incremental post-guard for streamed answers.
+
+    Text is fed chunk by chunk through the snapshot's automaton. Everything
+    except a lookback window one character shorter than the longest pattern
+    is released, since no future match can start before that window. Redact
+    rules are applied to the held-back text as matches complete; a protected
+    clause or block rule stops the stream before any part of it is released.
+    """
+
+    def __init__(self, guard: CompiledGuard):
+        self.guard = guard
+        self.matcher = guard.matcher
+        self.hold = max(self.matcher.max_length - 1, 0)
+        self.redactions = guard.rules.get("redactions", [])
+        self.blocked = None
+        self.redacted_policies = []
+        self._node = 0
+        self._pending = []   # original characters, one slot per lowercased unit
+        self._base = 0       # global offset of _pending[0]
+        self._cursor = 0     # global offset of the next character to release
+        self._spans = []     # pending redaction spans (start, end), global offsets
+
+    def _on_match(self, pattern_id, end):
+        payload = self.matcher.payloads[pattern_id]
+        start = end - len(self.matcher.patterns[pattern_id])
+        if payload[0] == PROTECTED:
+            clause = self.guard.protected_clauses[payload[1]]
+            self.blocked = {"action":"blocked","reason":f"Protected information overlap: {clause[:50]}...",
+                            "policy":"protected_clause"}
+            return
+        rule = self.redactions[payload[1]]
+        if rule.get("action") == "block":
+            self.blocked = {"action":"blocked","reason":f"Policy {rule['name']} matched","policy":rule["name"]}
+        elif rule.get("action") == "redact":
+            self._spans.append((start, end))
+            if rule["name"] not in self.redacted_policies:
+                self.redacted_policies.append(rule["name"])
+
+    def _release(self, upto):
+        parts = []
+        self._spans.sort()
+        while self._cursor < upto:
+            if self._spans and self._spans[0][0] < upto:
+                start, end = self._spans.pop(0)
+                if end <= self._cursor:
+                    continue
+                start = max(start, self._cursor)
+                parts.append("".join(self._pending[self._cursor - self._base:start - self._base]))
+                parts.append("[REDACTED]")
+                self._cursor = end
+            else:
+                parts.append("".join(self._pending[self._cursor - self._base:upto - self._base]))
+                self._cursor = upto
+        # Drop released characters from the buffer
+        del self._pending[:self._cursor - self._base]
+        self._base = self._cursor
+        return "".join(parts)
+
+    def feed(self, text: str) -> str:
+        """Consume a chunk; returns the text that is now safe to emit"""
+        if self.blocked:
+            return ""
+        step, outputs = self.matcher.step, self.matcher.outputs
+        for ch in text:
+            lowered = ch.lower()
+            for i, unit in enumerate(lowered):
+                self._pending.append(ch if i == 0 else "")
+                self._node = step(self._node, unit)
+                end = self._base + len(self._pending)
+                for pattern_id in outputs(self._node):
+                    self._on_match(pattern_id, end)
+                if self.blocked:
+                    return ""
+        return self._release(max(self._base + len(self._pending) - self.hold, self._cursor))
+
+    def finish(self) -> str:
+        """Flush the lookback window once the stream has ended"""
+        if self.blocked:
+            return ""
+        return self._release(self._base + len(self._pending))
+
+    def result(self):
+        if self.blocked:
+            return self.blocked
+        if self.redacted_policies:
+            return {"action":"redacted","reason":f"Redacted {', '.join(self.redacted_policies)}",
+                    "policy":self.redacted_policies[0]}
+        return {"action":"pass","reason":"No violation"}
@@ -0,0 +1,53 @@
+import os
+from typing import Dict, Optional
+
+# OpenAI-compatible chat completion backends, selected with LLM_BACKEND.
+BACKENDS: Dict[str, Dict[str, Optional[str]]] = {
+    "friendli": {
+        "base_url": "https://api.friendli.ai/serverless/v1",
+        "api_key_env": "FRIENDLI_TOKEN",
+        "model_env": "FRIENDLI_MODEL",
+        "model": "meta-llama-3.1-8b-instruct",
+    },
+    "openai": {
+        "base_url": "https://api.openai.com/v1",
+        "api_key_env": "OPENAI_API_KEY",
+        "model_env": "OPENAI_MODEL",
+        "model": "gpt-4o-mini",
+    },
+    # Local canned-response server (see stub_llm_server.py); no network needed
+    "stub": {
+        "base_url": "http://127.0.0.1:8089/v1",
+        "api_key_env": None,
+        "model_env": None,
+        "model": "stub-model",
+    },
+}
+
+def resolve_backend(name: Optional[str] = None) -> Dict[str, str]:
+    """
+    Resolve the active backend to {name, base_url, api_key, model}.
+
+    LLM_BASE_URL, LLM_API_KEY and LLM_MODEL override the backend defaults,
+    e.g. to point the "stub" backend at another port.
+    """
+    name = (name or os.getenv("LLM_BACKEND", "friendli")).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND {name!r}; expected one of {sorted(BACKENDS)}")
+    backend = BACKENDS[name]
+
+    api_key = os.getenv("LLM_API_KEY")
+    if api_key is None and backend["api_key_env"]:
+        api_key = os.getenv(backend["api_key_env"])
+
+    model = os.getenv("LLM_MODEL")
+    if model is None and backend["model_env"]:
+        model = os.getenv(backend["model_env"])
+
+    return {
+        "name": name,
+        "base_url": os.getenv("LLM_BASE_URL", backend["base_url"]),
+        # The OpenAI client refuses an empty key even when the server ignores it
+        "api_key": api_key or "not-needed",
+        "model": model or backend["model"],
+    }
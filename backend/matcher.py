@@ -0,0 +1,105 @@
+from collections import deque
+from typing import Any, Iterable, List, NamedTuple, Tuple
+
+
+class Match(NamedTuple):
+    start: int
+    end: int
+    pattern_id: int
+
+
+class PatternMatcher:
+    """
+    Case-insensitive Aho-Corasick automaton.
+
+    Built once from a set of (pattern, payload) pairs, it reports every
+    occurrence of every pattern in a single linear pass over the text,
+    independent of how many patterns were loaded.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, Any]]):
+        self.patterns: List[str] = []
+        self.payloads: List[Any] = []
+        self.max_length = 0
+
+        self._goto: List[dict] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+
+        for text, payload in patterns:
+            key = text.lower()
+            if not key:
+                continue
+            self._insert(key, len(self.patterns))
+            self.patterns.append(key)
+            self.payloads.append(payload)
+            self.max_length = max(self.max_length, len(key))
+
+        self._build_links()
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def _insert(self, key: str, pattern_id: int) -> None:
+        node = 0
+        for ch in key:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(pattern_id)
+
+    def _build_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt].extend(self._out[self._fail[nxt]])
+
+    def step(self, node: int, ch: str) -> int:
+        """Advance the automaton by one (already lowercased) character."""
+        goto, fail = self._goto, self._fail
+        while node and ch not in goto[node]:
+            node = fail[node]
+        return goto[node].get(ch, 0)
+
+    def outputs(self, node: int) -> List[int]:
+        """Pattern ids that end at the given automaton state."""
+        return self._out[node]
+
+    def find_all(self, text: str) -> List[Match]:
+        """Return every (possibly overlapping) pattern occurrence in text."""
+        if not self.patterns or not text:
+            return []
+
+        lowered = text.lower()
+        # Some characters lowercase to more than one code point; keep a map
+        # back to the original offsets in that (rare) case.
+        origin = None
+        if len(lowered) != len(text):
+            origin = [i for i, ch in enumerate(text) for _ in ch.lower()]
+            origin.append(len(text))
+
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self.patterns
+        matches = []
+        node = 0
+        for i, ch in enumerate(lowered):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for pattern_id in out[node]:
+                start = i + 1 - len(patterns[pattern_id])
+                if origin is None:
+                    matches.append(Match(start, i + 1, pattern_id))
+                else:
+                    matches.append(Match(origin[start], origin[i] + 1, pattern_id))
+        return matches
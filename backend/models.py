@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 class AskRequest(BaseModel):
     query: str
@@ -10,3 +10,12 @@ class AskResponse(BaseModel):
     reason: str
     safe_output: str
     evidence: Optional[Dict[str, Any]] = {}
+
+class BatchDocument(BaseModel):
+    filename: str
+    content: str
+    sensitivity: str = "public"
+
+class BatchUploadRequest(BaseModel):
+    documents: List[BatchDocument]
+    timestamp: Optional[str] = None
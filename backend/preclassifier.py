@@ -0,0 +1,163 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+from text_index import tokenize
+
+LABELS = ("safe", "sensitive", "exfiltration")
+
+# (label, weight, name, pattern). Weights are additive evidence for a label.
+FEATURES = [
+    ("exfiltration", 2.0, "word_for_word", r"\bword[\s-]*(?:to|for|by)[\s-]*word\b"),
+    ("exfiltration", 2.0, "verbatim", r"\bverbatim\b"),
+    ("exfiltration", 2.0, "full_text", r"\b(?:full|entire|whole|complete|raw)\s+(?:text|contract|document|agreement)\b"),
+    ("exfiltration", 2.0, "dump_all", r"\b(?:dump|list|print|show|give|output|copy|paste|repeat)\b.{0,40}\b(?:all|every|each)\b.{0,20}\b(?:clauses?|sections?|terms|contents?)\b"),
+    ("exfiltration", 1.5, "whats_in_document", r"\bwhat'?s\s+in\s+the\s+(?:document|contract|file)\b"),
+    ("exfiltration", 2.0, "prompt_injection", r"\bignore\s+(?:all\s+|any\s+)?(?:previous|prior|above)\s+instructions\b"),
+    ("sensitive", 2.0, "penalty", r"\b(?:termination\s+)?penalt(?:y|ies)\b|\bliquidated\s+damages\b|\btermination\s+fee\b"),
+    ("sensitive", 2.0, "pricing", r"\bdiscounts?\b|\brebates?\b|\bpreferred\s+pricing\b|\bpricing\s+tiers?\b"),
+    ("sensitive", 2.0, "compensation", r"\bsalar(?:y|ies)\b|\bbonus(?:es)?\b|\bequity\b|\bstock\s+(?:units|options)\b|\brsus?\b|\bcompensation\b"),
+    ("sensitive", 1.5, "nda", r"\bnda\b|\bnon[\s-]?disclosure\b|\bconfidential\b|\btrade\s+secrets?\b"),
+    ("sensitive", 1.5, "personal", r"\b(?:home|personal)\s+address\b|\bsocial\s+security\b|\bssn\b"),
+    ("safe", 1.0, "office_hours", r"\b(?:office|working|work|business)\s+hours\b"),
+    ("safe", 1.0, "start_date", r"\bstart\s+date\b|\bjob\s+title\b|\bposition\b"),
+    ("safe", 1.0, "location", r"\b(?:office\s+)?location\b|\bwhere\s+is\s+the\s+office\b"),
+    ("safe", 1.0, "payment_terms", r"\bpayment\s+terms\b|\bnet\s+\d+\b|\bnotice\s+period\b"),
+    ("safe", 1.0, "benefits", r"\bvacation\b|\bpto\b|\bholidays?\b|\bsick\s+leave\b|\bbenefits\b"),
+]
+
+_COMPILED = [(label, weight, name, re.compile(pattern, re.I)) for label, weight, name, pattern in FEATURES]
+
+HEURISTIC_THRESHOLD = float(os.getenv("PRECLASSIFY_THRESHOLD", "1.0"))
+HEURISTIC_MARGIN = float(os.getenv("PRECLASSIFY_MARGIN", "1.0"))
+MODEL_THRESHOLD = float(os.getenv("PRECLASSIFY_MODEL_THRESHOLD", "0.95"))
+MODEL_MIN_EXAMPLES = int(os.getenv("PRECLASSIFY_MODEL_MIN_EXAMPLES", "50"))
+
+_SEVERITY = {"safe": "low", "sensitive": "medium", "exfiltration": "high"}
+
+# Tiers answered without the LLM (see preclassify)
+LOCAL_TIERS = ("heuristic", "model")
+
+def heuristic_classify(query: str) -> Optional[dict]:
+    """
+    Keyword/regex tier. Returns a decision only when a blocking label
+    (sensitive or exfiltration) clearly dominates. Benign keywords are only
+    counter-evidence: a query is never passed as "safe" locally, since one
+    harmless term says nothing about the rest of it.
+    """
+    scores = dict.fromkeys(LABELS, 0.0)
+    reasons = []
+    for label, weight, name, pattern in _COMPILED:
+        if pattern.search(query):
+            scores[label] += weight
+            reasons.append(name)
+
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    (label, top), (_, second) = ranked[0], ranked[1]
+    if top < HEURISTIC_THRESHOLD or top - second < HEURISTIC_MARGIN:
+        return None
+    if label == "safe":
+        return None
+    return {"label": label, "severity": _SEVERITY[label], "reasons": reasons, "tier": "heuristic"}
+
+def _features(query: str) -> List[str]:
+    tokens = tokenize(query)
+    return tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+class NaiveBayesClassifier:
+    """
+    Multinomial naive Bayes over unigrams and bigrams: a small linear model
+    in log space, cheap to train from the audit log.
+    """
+
+    def __init__(self):
+        self.label_counts: Counter = Counter()
+        self.feature_counts: Dict[str, Counter] = {label: Counter() for label in LABELS}
+        self.totals: Counter = Counter()
+        self.vocabulary = set()
+
+    def __len__(self) -> int:
+        return sum(self.label_counts.values())
+
+    def add(self, query: str, label: str) -> None:
+        if label not in self.feature_counts:
+            return
+        features = _features(query)
+        self.label_counts[label] += 1
+        self.feature_counts[label].update(features)
+        self.totals[label] += len(features)
+        self.vocabulary.update(features)
+
+    def predict(self, query: str):
+        """Return (label, probability)"""
+        n = len(self)
+        vocab = len(self.vocabulary) + 1
+        features = _features(query)
+        log_probs = {}
+        for label in LABELS:
+            if not self.label_counts[label]:
+                continue
+            log_p = math.log(self.label_counts[label] / n)
+            counts, total = self.feature_counts[label], self.totals[label]
+            for feature in features:
+                log_p += math.log((counts[feature] + 1) / (total + vocab))
+            log_probs[label] = log_p
+        if not log_probs:
+            return None, 0.0
+        best = max(log_probs, key=log_probs.get)
+        norm = sum(math.exp(lp - log_probs[best]) for lp in log_probs.values())
+        return best, 1.0 / norm
+
+def train_from_log(log_file: str = os.path.join("logs", "events.log")) -> NaiveBayesClassifier:
+    """
+    Train on past pre-guard outcomes: blocked_pre events carry the label,
+    every query that got past the pre-guard counts as safe. Events decided
+    by a local tier are skipped so the model never learns from its own (or
+    the heuristic's) mistakes.
+    """
+    model = NaiveBayesClassifier()
+    if not os.path.exists(log_file):
+        return model
+    with open(log_file, "r") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            data = event.get("data") or {}
+            query = data.get("query")
+            if not query or (data.get("decision") or {}).get("tier") in LOCAL_TIERS:
+                continue
+            if event.get("event_type") == "blocked_pre":
+                model.add(query, (data.get("decision") or {}).get("label", ""))
+            elif event.get("event_type") in ("pass", "redacted", "blocked_post"):
+                model.add(query, "safe")
+    return model
+
+model: Optional[NaiveBayesClassifier] = None
+if os.getenv("PRECLASSIFY_TRAIN_FROM_LOG", "0") == "1":
+    model = train_from_log()
+
+def model_classify(query: str) -> Optional[dict]:
+    if model is None or len(model) < MODEL_MIN_EXAMPLES:
+        return None
+    label, probability = model.predict(query)
+    # Like the heuristic, only blocking labels short-circuit the LLM
+    if label in (None, "safe") or probability < MODEL_THRESHOLD:
+        return None
+    return {
+        "label": label,
+        "severity": _SEVERITY[label],
+        "reasons": [f"model_p={probability:.3f}"],
+        "tier": "model",
+    }
+
+def preclassify(query: str) -> Optional[dict]:
+    """
+    Local tiers only. Decisions are always blocking (sensitive or
+    exfiltration); None means the caller should ask the LLM.
+    """
+    return heuristic_classify(query) or model_classify(query)
@@ -0,0 +1,224 @@
+import asyncio
+import inspect
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+class LLMUnavailableError(Exception):
+    """The LLM could not answer within its budget (after retries)"""
+
+class CircuitOpenError(LLMUnavailableError):
+    """Calls are being short-circuited because the endpoint keeps failing"""
+
+class CircuitBreaker:
+    """
+    Classic closed → open → half-open breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    every call fails fast for `reset_timeout` seconds; then a single probe
+    call is let through, and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+            self._probe_in_flight = False
+        if self.state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.trips += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def release(self) -> None:
+        """Free the half-open probe slot without an outcome (e.g. the call was cancelled)"""
+        self._probe_in_flight = False
+
+def _discard_result(task: asyncio.Task) -> None:
+    """Done callback for losing hedged attempts: consume errors, close results"""
+    if task.cancelled() or task.exception() is not None:
+        return
+    result = task.result()
+    if hasattr(result, "aclose") or hasattr(result, "close"):
+        asyncio.ensure_future(_close_quietly(result))
+
+async def _close_quietly(result: Any) -> None:
+    close = getattr(result, "aclose", None) or getattr(result, "close")
+    try:
+        outcome = close()
+        if inspect.isawaitable(outcome):
+            await outcome
+    except Exception as e:
+        print(f"Failed to close a discarded hedged result: {e}")
+
+class LatencyTracker:
+    """Rolling window of recent successful call latencies"""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(p * len(ordered)), len(ordered) - 1)]
+
+class ResilientCaller:
+    """
+    Wraps one kind of remote call with:
+      - a total latency budget per logical call, and a per-attempt timeout
+        (`attempt_timeout`, default an equal share of the budget per attempt)
+        so a hung endpoint cannot use up the whole budget on one attempt
+      - bounded retries with full-jitter exponential backoff
+      - a (possibly shared) circuit breaker that fails fast when open
+      - optional hedging: once latency history exists, a duplicate request is
+        sent if the first has not answered by the `hedge_percentile` latency,
+        and whichever finishes first wins; results of losing attempts that
+        also finished are closed (e.g. an opened stream)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        budget: float,
+        breaker: CircuitBreaker,
+        retries: int = 2,
+        backoff_base: float = 0.2,
+        backoff_max: float = 2.0,
+        retryable: Tuple[Type[BaseException], ...] = (asyncio.TimeoutError, ConnectionError),
+        hedge: bool = False,
+        hedge_percentile: float = 0.95,
+        hedge_min_samples: int = 20,
+        attempt_timeout: Optional[float] = None,
+    ):
+        self.name = name
+        self.budget = budget
+        self.breaker = breaker
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retryable = tuple(retryable) + (asyncio.TimeoutError,)
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.attempt_timeout = attempt_timeout
+        self.latency = LatencyTracker()
+        self.stats = {
+            "calls": 0, "attempts": 0, "successes": 0, "failures": 0, "retries": 0,
+            "timeouts": 0, "rejected": 0, "hedges": 0, "hedge_wins": 0,
+        }
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self.latency) < self.hedge_min_samples:
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+
+    async def _attempt(self, fn: Callable[[], Awaitable[Any]], budget: float) -> Any:
+        delay = self._hedge_delay()
+        if delay is None or delay >= budget:
+            return await asyncio.wait_for(fn(), budget)
+
+        primary = asyncio.ensure_future(fn())
+        tasks = {primary}
+        winner = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.stats["hedges"] += 1
+                tasks.add(asyncio.ensure_future(fn()))
+                done, _ = await asyncio.wait(tasks, timeout=budget - delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError()
+            winner = done.pop()
+            if winner is not primary:
+                self.stats["hedge_wins"] += 1
+            return winner.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                if task is not winner:
+                    task.add_done_callback(_discard_result)
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], budget: Optional[float] = None) -> Any:
+        """Run fn() under this caller's policy; raises LLMUnavailableError on give-up"""
+        self.stats["calls"] += 1
+        budget = budget or self.budget
+        deadline = time.monotonic() + budget
+        attempt_timeout = self.attempt_timeout or budget / (self.retries + 1)
+        last_error: Optional[BaseException] = None
+        attempts = 0
+
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                self.stats["rejected"] += 1
+                raise CircuitOpenError(f"{self.name}: circuit open") from last_error
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            attempts += 1
+            self.stats["attempts"] += 1
+            started = time.monotonic()
+            try:
+                result = await self._attempt(fn, min(remaining, attempt_timeout))
+            except self.retryable as e:
+                last_error = e
+                if isinstance(e, asyncio.TimeoutError):
+                    self.stats["timeouts"] += 1
+                self.breaker.record_failure()
+            except Exception:
+                # The endpoint answered (bad request, auth, ...): not an outage
+                self.breaker.record_success()
+                raise
+            except BaseException:
+                # Cancelled: no outcome either way, but a probe must not stay in flight
+                self.breaker.release()
+                raise
+            else:
+                self.latency.add(time.monotonic() - started)
+                self.breaker.record_success()
+                self.stats["successes"] += 1
+                return result
+
+            if attempt < self.retries:
+                self.stats["retries"] += 1
+                pause = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                await asyncio.sleep(min(pause, max(deadline - time.monotonic(), 0)))
+
+        self.stats["failures"] += 1
+        raise LLMUnavailableError(f"{self.name}: gave up after {attempts} attempts") from last_error
+
+    def snapshot(self) -> Dict[str, Any]:
+        p95 = self.latency.percentile(0.95)
+        return {**self.stats, "p95_seconds": p95}
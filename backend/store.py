@@ -1,12 +1,177 @@
+import asyncio
+import atexit
 import json
 import os
+import queue
+import threading
+import time
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+_FLUSH = object()
+_STOP = object()
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+class AuditLogger:
+    """
+    Queue-backed audit log writer.
+    
+    Callers only enqueue a serialized line; a dedicated writer thread drains
+    the queue in batches, writes each batch with a single write() and fsyncs
+    every `fsync_interval` seconds or `fsync_batch` events, whichever comes
+    first. When the queue is full, "block" waits up to `block_timeout`
+    seconds for space before dropping, "drop" drops immediately; either way
+    the drop is counted. Calls made on an event loop never wait, whatever
+    the policy: blocking there would stall every request on the loop.
+    """
+    
+    def __init__(
+        self,
+        log_file: str,
+        queue_size: int = 10000,
+        batch_size: int = 256,
+        fsync_interval: float = 1.0,
+        fsync_batch: int = 512,
+        policy: str = "block",
+        block_timeout: float = 0.05,
+    ):
+        self.log_file = log_file
+        self.batch_size = batch_size
+        self.fsync_interval = fsync_interval
+        self.fsync_batch = fsync_batch
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.stats = {"enqueued": 0, "written": 0, "dropped": 0, "fsyncs": 0, "write_errors": 0}
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+    
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+    
+    def log(self, line: str) -> bool:
+        """Enqueue one log line; returns False if it had to be dropped"""
+        self._ensure_started()
+        try:
+            if self.policy == "block" and not _on_event_loop():
+                self._queue.put(line, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(line)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return False
+        self.stats["enqueued"] += 1
+        return True
+    
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything enqueued so far is written and fsynced"""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        return done.wait(timeout)
+    
+    def close(self, timeout: float = 5.0) -> None:
+        """Flush pending events and stop the writer thread"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put((_STOP, None))
+        self._thread.join(timeout)
+    
+    def _open(self) -> int:
+        directory = os.path.dirname(self.log_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return os.open(self.log_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    
+    def _write(self, fd: int, lines: list) -> None:
+        data = "".join(lines).encode("utf-8")
+        try:
+            view = memoryview(data)
+            while view:
+                written = os.write(fd, view)
+                view = view[written:]
+            self.stats["written"] += len(lines)
+        except OSError as e:
+            self.stats["write_errors"] += 1
+            print(f"Failed to log event: {e}")
+    
+    def _run(self) -> None:
+        fd = self._open()
+        unsynced = 0
+        last_sync = time.monotonic()
+        try:
+            while True:
+                wait = max(self.fsync_interval - (time.monotonic() - last_sync), 0.0) if unsynced else None
+                try:
+                    item = self._queue.get(timeout=wait)
+                except queue.Empty:
+                    item = None
+                
+                batch, control = [], None
+                while item is not None:
+                    if isinstance(item, tuple):
+                        control = item
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        item = None
+                
+                if batch:
+                    self._write(fd, batch)
+                    unsynced += len(batch)
+                
+                due = time.monotonic() - last_sync >= self.fsync_interval
+                if unsynced and (control is not None or unsynced >= self.fsync_batch or due):
+                    os.fsync(fd)
+                    self.stats["fsyncs"] += 1
+                    unsynced = 0
+                    last_sync = time.monotonic()
+                
+                if control is not None:
+                    kind, done = control
+                    if kind is _STOP:
+                        return
+                    done.set()
+        finally:
+            os.close(fd)
+
+def _env_logger() -> AuditLogger:
+    return AuditLogger(
+        os.path.join("logs", "events.log"),
+        queue_size=int(os.getenv("AUDIT_QUEUE_SIZE", "10000")),
+        batch_size=int(os.getenv("AUDIT_BATCH_SIZE", "256")),
+        fsync_interval=float(os.getenv("AUDIT_FSYNC_INTERVAL", "1.0")),
+        fsync_batch=int(os.getenv("AUDIT_FSYNC_BATCH", "512")),
+        policy=os.getenv("AUDIT_QUEUE_POLICY", "block"),
+        block_timeout=float(os.getenv("AUDIT_BLOCK_TIMEOUT", "0.05")),
+    )
+
+audit_logger = _env_logger()
+atexit.register(audit_logger.close)
 
 def log_event(event_type: str, data: Dict[str, Any]) -> None:
     """
     Log an event to a JSON file for auditing purposes.
     
+    The event is serialized here and written asynchronously by the
+    background audit logger.
+    
     Args:
         event_type: Type of event (e.g., 'scan', 'analysis', 'error')
         data: Dictionary containing event data
@@ -17,51 +182,100 @@ def log_event(event_type: str, data: Dict[str, Any]) -> None:
         "data": data
     }
     
-    # Create logs directory if it doesn't exist
-    logs_dir = "logs"
-    if not os.path.exists(logs_dir):
-        os.makedirs(logs_dir)
-    
-    # Append to log file
-    log_file = os.path.join(logs_dir, "events.log")
-    
     try:
-        with open(log_file, "a") as f:
-            f.write(json.dumps(log_entry) + "\n")
+        audit_logger.log(json.dumps(log_entry) + "\n")
     except Exception as e:
         print(f"Failed to log event: {e}")
 
-def get_recent_events(limit: int = 100) -> list:
+def _tail_lines(path: str, limit: int, end: Optional[int] = None, block_size: int = 8192):
     """
-    Retrieve recent events from the log file.
+    Read the last `limit` complete lines ending at byte offset `end` by
+    seeking backwards block by block from the end of the file.
+    
+    Returns (lines, start) where start is the byte offset of the first
+    returned line, i.e. the cursor for the next (older) page.
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        end = size if end is None else min(end, size)
+        
+        # Ignore a trailing line that is still being written
+        pos = end
+        buf = b""
+        if end:
+            f.seek(end - 1)
+            if f.read(1) != b"\n":
+                while pos > 0 and b"\n" not in buf:
+                    step = min(block_size, pos)
+                    pos -= step
+                    f.seek(pos)
+                    buf = f.read(step) + buf
+                cut = buf.rfind(b"\n") + 1
+                end = pos + cut
+                buf = buf[:cut]
+        
+        # Need limit + 1 newlines to be sure the oldest line is complete
+        while pos > 0 and buf.count(b"\n") <= limit:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+    
+    lines = buf.split(b"\n")[:-1]
+    if pos > 0:
+        # The first element may be a partial line; it belongs to an older page
+        lines = lines[1:]
+    lines = lines[-limit:] if limit > 0 else []
+    start = end - sum(len(line) + 1 for line in lines)
+    return lines, start
+
+def get_events_page(limit: int = 100, before: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Retrieve one page of events, newest page first.
     
     Args:
         limit: Maximum number of events to return
+        before: Cursor from a previous page (byte offset); None starts at the end
         
     Returns:
-        List of recent events
+        {"events": [...], "next_cursor": int or None}. Pass next_cursor back as
+        `before` to page further into the history; None means no older events.
     """
     log_file = os.path.join("logs", "events.log")
     
     if not os.path.exists(log_file):
-        return []
+        return {"events": [], "next_cursor": None}
     
     events = []
+    start = 0
     try:
-        with open(log_file, "r") as f:
-            lines = f.readlines()
-            
-        # Get the last 'limit' lines
-        recent_lines = lines[-limit:] if len(lines) > limit else lines
+        lines, start = _tail_lines(log_file, limit, before)
         
-        for line in recent_lines:
+        for line in lines:
             try:
-                event = json.loads(line.strip())
+                event = json.loads(line.decode("utf-8").strip())
                 events.append(event)
-            except json.JSONDecodeError:
+            except (json.JSONDecodeError, UnicodeDecodeError):
                 continue
                 
     except Exception as e:
         print(f"Failed to read events: {e}")
     
-    return events
+    return {"events": events, "next_cursor": start if start > 0 else None}
+
+def get_recent_events(limit: int = 100, before: Optional[int] = None) -> list:
+    """
+    Retrieve recent events from the log file.
+    
+    Only the tail of the file is read, so cost depends on `limit` rather
+    than on the size of the audit trail.
+    
+    Args:
+        limit: Maximum number of events to return
+        before: Optional byte-offset cursor (see get_events_page)
+        
+    Returns:
+        List of recent events
+    """
+    return get_events_page(limit, before)["events"]
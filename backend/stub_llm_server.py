@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Offline, OpenAI-compatible stub LLM server for local runs and load tests.
+
+Responses are deterministic and canned (classification JSON, an answer
+built from the supplied context, a polite block message); only latency and
+injected faults are random, from a seeded generator.
+
+    python stub_llm_server.py --port 8089 --latency uniform:0.05,0.2 --error-rate 0.01
+    LLM_BACKEND=stub uvicorn app:app
+
+Latency specs: "fixed:S", "uniform:LO,HI", "lognormal:MU,SIGMA", "exp:MEAN"
+(seconds). STUB_LATENCY, STUB_ERROR_RATE, STUB_TIMEOUT_RATE and STUB_SEED
+configure the same settings from the environment.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+EXFILTRATION = re.compile(r"word[\s-]*(?:to|for)[\s-]*word|verbatim|full text|dump|list all|entire (?:contract|document)", re.I)
+SENSITIVE = re.compile(r"penalt|liquidated|discount|rebate|pricing|salary|bonus|equity|stock|confidential|nda", re.I)
+
+def parse_latency(spec: str):
+    """Turn a latency spec into a zero-argument sampler (seconds)"""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda rng: values[0] if values else 0.0
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    if kind == "exp":
+        return lambda rng: rng.expovariate(1.0 / values[0])
+    raise ValueError(f"Unknown latency spec {spec!r}")
+
+class StubConfig:
+    def __init__(self, latency: str, error_rate: float, timeout_rate: float, seed: int):
+        self.latency_spec = latency
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.rng = random.Random(seed)
+        self.stats = {"requests": 0, "errors": 0, "timeouts": 0}
+
+config = StubConfig(
+    latency=os.getenv("STUB_LATENCY", "fixed:0"),
+    error_rate=float(os.getenv("STUB_ERROR_RATE", "0")),
+    timeout_rate=float(os.getenv("STUB_TIMEOUT_RATE", "0")),
+    seed=int(os.getenv("STUB_SEED", "42")),
+)
+
+def canned_reply(messages) -> str:
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+
+    if system.startswith("You are a compliance classifier"):
+        if EXFILTRATION.search(user):
+            label, severity = "exfiltration", "high"
+        elif SENSITIVE.search(user):
+            label, severity = "sensitive", "medium"
+        else:
+            label, severity = "safe", "low"
+        return json.dumps({"label": label, "severity": severity, "reasons": ["stub"]})
+
+    if system.startswith("You are a contract assistant"):
+        context, _, _ = user.partition("\n\nQuestion:")
+        clauses = [line[2:] for line in context.splitlines() if line.startswith("- ")]
+        if not clauses:
+            return "This information is protected or not available."
+        return "Based on the contract: " + " ".join(clauses[:2])
+
+    reason = user.replace("Reason:", "").strip()
+    return f"We're sorry, but this information can't be disclosed. {reason}".strip()
+
+def _completion(content: str, model: str) -> dict:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": len(content.split())},
+    }
+
+def _chunks(content: str, model: str):
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+    for token in re.findall(r"\S+\s*|\s+", content):
+        chunk = {
+            "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+            "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    done = {
+        "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+    }
+    yield f"data: {json.dumps(done)}\n\n"
+    yield "data: [DONE]\n\n"
+
+app = FastAPI(title="Stub LLM", version="0.1.0")
+
+@app.get("/health")
+def health():
+    return {"ok": True, "latency": config.latency_spec, **config.stats}
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    config.stats["requests"] += 1
+
+    roll = config.rng.random()
+    if roll < config.timeout_rate:
+        config.stats["timeouts"] += 1
+        await asyncio.sleep(3600)
+    await asyncio.sleep(max(config.sample_latency(config.rng), 0.0))
+    if roll < config.timeout_rate + config.error_rate:
+        config.stats["errors"] += 1
+        return JSONResponse(status_code=500, content={"error": {"message": "injected failure", "type": "server_error"}})
+
+    model = body.get("model", "stub-model")
+    content = canned_reply(body.get("messages", []))
+    if body.get("stream"):
+        return StreamingResponse(_chunks(content, model), media_type="text/event-stream")
+    return _completion(content, model)
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default=config.latency_spec)
+    parser.add_argument("--error-rate", type=float, default=config.error_rate)
+    parser.add_argument("--timeout-rate", type=float, default=config.timeout_rate)
+    parser.add_argument("--seed", type=int, default=int(os.getenv("STUB_SEED", "42")))
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency, args.error_rate, args.timeout_rate, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
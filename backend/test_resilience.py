@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpenError, LLMUnavailableError, ResilientCaller
+
+def half_open_caller():
+    """A caller whose breaker has tripped and is due for its half-open probe"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.state == "open"
+    return ResilientCaller("test", budget=1.0, breaker=breaker, retries=0)
+
+def make_caller(**kwargs):
+    kwargs.setdefault("budget", 1.0)
+    kwargs.setdefault("backoff_base", 0.0)
+    return ResilientCaller("test", breaker=CircuitBreaker(failure_threshold=100), **kwargs)
+
+def flaky(outcomes):
+    """fn whose successive calls follow outcomes: an exception to raise, "hang", or a value"""
+    outcomes = iter(outcomes)
+
+    async def fn():
+        outcome = next(outcomes)
+        if outcome == "hang":
+            await asyncio.sleep(60)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+    return fn
+
+async def succeed():
+    return "ok"
+
+def test_cancelled_probe_releases_half_open_slot():
+    caller = half_open_caller()
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(10)
+
+        probe = asyncio.ensure_future(caller.call(hang))
+        await started.wait()
+        assert caller.breaker.state == "half_open"
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        return await caller.call(succeed)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert caller.breaker.state == "closed"
+
+def test_non_retryable_probe_error_releases_half_open_slot():
+    caller = half_open_caller()
+
+    async def bad_request():
+        raise ValueError("400 bad request")
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            await caller.call(bad_request)
+        return await caller.call(succeed)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert caller.breaker.state == "closed"
+
+def test_retryable_probe_failure_reopens_circuit():
+    caller = half_open_caller()
+
+    async def refused():
+        raise ConnectionError("refused")
+
+    with pytest.raises(Exception) as failed:
+        asyncio.run(caller.call(refused))
+    assert not isinstance(failed.value, CircuitOpenError)
+    assert caller.breaker.state == "open"
+    assert caller.breaker.trips == 2
+
+def test_retryable_errors_are_retried():
+    caller = make_caller(retries=2)
+    fn = flaky([ConnectionError("reset"), ConnectionError("reset"), "ok"])
+    assert asyncio.run(caller.call(fn)) == "ok"
+    assert caller.stats["attempts"] == 3
+    assert caller.stats["retries"] == 2
+    assert caller.breaker.failures == 0
+
+def test_non_retryable_errors_are_not_retried():
+    caller = make_caller(retries=2)
+    with pytest.raises(ValueError):
+        asyncio.run(caller.call(flaky([ValueError("400"), "ok"])))
+    assert caller.stats["attempts"] == 1
+
+def test_hung_attempt_times_out_and_is_retried():
+    caller = make_caller(budget=0.6, retries=2)
+    assert asyncio.run(caller.call(flaky(["hang", "ok"]))) == "ok"
+    assert caller.stats["timeouts"] == 1
+    assert caller.stats["attempts"] == 2
+
+def test_attempt_timeout_overrides_budget_share():
+    caller = make_caller(budget=1.0, retries=1, attempt_timeout=0.05)
+    assert asyncio.run(caller.call(flaky(["hang", "ok"]))) == "ok"
+    assert caller.latency.percentile(0.5) < 0.05
+
+def test_budget_exhausted_reports_attempts_made():
+    caller = make_caller(budget=0.3, retries=2)
+    with pytest.raises(LLMUnavailableError) as failed:
+        asyncio.run(caller.call(flaky(["hang"] * 3)))
+    assert caller.stats["timeouts"] == caller.stats["attempts"] == 3
+    assert "after 3 attempts" in str(failed.value)
+    assert isinstance(failed.value.__cause__, asyncio.TimeoutError)
+
+def test_hedge_wins_when_primary_is_slow():
+    caller = make_caller(hedge=True, hedge_min_samples=1)
+    caller.latency.add(0.01)
+    assert asyncio.run(caller.call(flaky(["hang", "fast"]))) == "fast"
+    assert caller.stats["hedges"] == 1
+    assert caller.stats["hedge_wins"] == 1
+
+class Closable:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    async def aclose(self):
+        self.closed = True
+
+def test_finished_hedge_loser_is_closed():
+    caller = make_caller(hedge=True, hedge_min_samples=1)
+    caller.latency.add(0.01)
+    results = [Closable("primary"), Closable("hedge")]
+
+    async def scenario():
+        released = asyncio.Event()
+        calls = iter(range(2))
+
+        async def fn():
+            if next(calls) == 0:
+                await released.wait()
+                return results[0]
+            # Let the primary finish in the same loop iteration as the hedge
+            released.set()
+            return results[1]
+
+        winner = await caller.call(fn)
+        await asyncio.sleep(0.01)
+        return winner
+
+    winner = asyncio.run(scenario())
+    loser = results[1] if winner is results[0] else results[0]
+    assert not winner.closed
+    assert loser.closed
@@ -0,0 +1,123 @@
+import heapq
+import math
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Ignored when scoring a query; still indexed so documents keep their length
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it me my of on or
+our please tell that the their there this to us was what when where which
+who why will with you your
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens used by every clause index"""
+    return TOKEN_RE.findall(text.lower())
+
+class InvertedIndex:
+    """
+    Incremental positional inverted index: token -> {doc_id: [positions]}.
+
+    Documents are added one at a time and never force a rebuild. Boolean and
+    phrase queries only touch the posting lists of the query terms, so their
+    cost does not depend on the size of the corpus.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, List[int]]] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, doc_id: int, text: str) -> None:
+        tokens = tokenize(text)
+        for position, token in enumerate(tokens):
+            self.postings.setdefault(token, {}).setdefault(doc_id, []).append(position)
+        self.doc_lengths[doc_id] = len(tokens)
+        self.total_length += len(tokens)
+
+    def _phrase_docs(self, tokens: List[str]) -> Set[int]:
+        postings = [self.postings.get(token) for token in tokens]
+        if not postings or not all(postings):
+            return set()
+        if len(tokens) == 1:
+            return set(postings[0])
+
+        candidates = set.intersection(*(set(p) for p in sorted(postings, key=len)))
+        matched = set()
+        for doc_id in candidates:
+            starts = set(postings[0][doc_id])
+            for offset, posting in enumerate(postings[1:], start=1):
+                starts &= {pos - offset for pos in posting[doc_id]}
+                if not starts:
+                    break
+            if starts:
+                matched.add(doc_id)
+        return matched
+
+    def query(self, terms: Iterable[str] = (), phrases: Iterable[str] = (),
+              mode: str = "or", limit: Optional[int] = None) -> List[int]:
+        """
+        Return matching doc ids in insertion order.
+
+        Each term and each phrase is one operand; mode "and" requires every
+        operand to match, mode "or" requires at least one.
+        """
+        operands = [self._phrase_docs([term]) for term in terms]
+        for phrase in phrases:
+            tokens = tokenize(phrase)
+            if tokens:
+                operands.append(self._phrase_docs(tokens))
+        if not operands:
+            return []
+
+        if mode == "and":
+            operands.sort(key=len)
+            docs = set(operands[0])
+            for operand in operands[1:]:
+                docs &= operand
+                if not docs:
+                    break
+        else:
+            docs = set().union(*operands)
+
+        ordered = sorted(docs)
+        return ordered[:limit] if limit is not None else ordered
+
+class BM25Index(InvertedIndex):
+    """
+    Inverted index with Okapi BM25 ranking.
+
+    Scoring statistics (document frequency, average length) are derived at
+    query time, so adding a document never requires a rebuild.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        super().__init__()
+        self.k1 = k1
+        self.b = b
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[int, float]]:
+        """Return up to top_k (doc_id, score) pairs, best first"""
+        n_docs = len(self.doc_lengths)
+        if not n_docs:
+            return []
+        avg_length = self.total_length / n_docs or 1.0
+
+        terms = {t for t in tokenize(query) if t not in STOPWORDS} or set(tokenize(query))
+        scores: Dict[int, float] = {}
+        for term in terms:
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, positions in posting.items():
+                tf = len(positions)
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
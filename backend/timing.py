@@ -0,0 +1,30 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# Per-request stage durations (seconds). Tasks spawned by the request inherit
+# the same dict, so stages run inside a coalesced or speculative task are
+# still attributed to the request that started them.
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+def start_request() -> Dict[str, float]:
+    """Begin collecting stage timings for the current request"""
+    timings: Dict[str, float] = {}
+    _timings.set(timings)
+    return timings
+
+@contextmanager
+def stage(name: str):
+    """Time a block and add it to the current request's `name` stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """Format timings as a Server-Timing header value (milliseconds)"""
+    return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in timings.items())